@@ -6,13 +6,27 @@ This script provides a command-line interface to control the USB host mode
 functionality of the HurricaneFPGA Cynthion device.
 
 Usage:
-    python3 usb_host_control.py --enable       # Enable host mode
-    python3 usb_host_control.py --enumerate    # Start enumeration
-    python3 usb_host_control.py --status       # Get status
-    python3 usb_host_control.py --monitor      # Monitor keyboard events
+    python3 usb_host_control.py enable         # Enable host mode
+    python3 usb_host_control.py enumerate      # Start enumeration
+    python3 usb_host_control.py status         # Get status
+    python3 usb_host_control.py monitor        # Monitor keyboard events
+    python3 usb_host_control.py daemon         # Hold the device open for later calls
+
+Monitoring reads HID reports straight from the device's interrupt IN
+endpoints when it exposes them. Otherwise it streams register reads with
+libusb async transfers when python-libusb1 is installed (pip install
+libusb1), falling back to synchronous pyusb polling.
 """
 
 import argparse
+import contextlib
+import errno
+import json
+import os
+import select
+import selectors
+import socket
+import struct
 import sys
 import time
 from typing import Optional
@@ -24,6 +38,48 @@ except ImportError:
     print("Error: pyusb not installed. Install with: pip install pyusb")
     sys.exit(1)
 
+try:
+    import usb1  # python-libusb1, optional: enables async monitoring
+except ImportError:
+    usb1 = None
+
+
+# HID modifier names, indexed by bit position in the modifier byte
+MODIFIER_NAMES = (
+    "LEFT_CTRL", "LEFT_SHIFT", "LEFT_ALT", "LEFT_GUI",
+    "RIGHT_CTRL", "RIGHT_SHIFT", "RIGHT_ALT", "RIGHT_GUI",
+)
+
+# HID Usage Table keycodes (simplified)
+_KEYCODE_NAME_MAP = {
+    0x04: "A", 0x05: "B", 0x06: "C", 0x07: "D", 0x08: "E", 0x09: "F",
+    0x0A: "G", 0x0B: "H", 0x0C: "I", 0x0D: "J", 0x0E: "K", 0x0F: "L",
+    0x10: "M", 0x11: "N", 0x12: "O", 0x13: "P", 0x14: "Q", 0x15: "R",
+    0x16: "S", 0x17: "T", 0x18: "U", 0x19: "V", 0x1A: "W", 0x1B: "X",
+    0x1C: "Y", 0x1D: "Z",
+    0x1E: "1", 0x1F: "2", 0x20: "3", 0x21: "4", 0x22: "5",
+    0x23: "6", 0x24: "7", 0x25: "8", 0x26: "9", 0x27: "0",
+    0x28: "ENTER", 0x29: "ESC", 0x2A: "BACKSPACE", 0x2B: "TAB",
+    0x2C: "SPACE", 0x39: "CAPS_LOCK"
+}
+
+# Keycode name for every possible keycode byte; unnamed codes read KEY_xx
+KEYCODE_NAMES = tuple(_KEYCODE_NAME_MAP.get(code, f"KEY_{code:02x}") for code in range(256))
+
+# Mouse monitor output: "[HH:MM:SS] LEFT RIGHT Move( +3,  -2) Wheel( +1)"
+MOUSE_BUTTON_LABELS = tuple(
+    "".join(f" {name}" for bit, name in ((0x01, "LEFT"), (0x02, "RIGHT"), (0x04, "MIDDLE"))
+            if buttons & bit)
+    for buttons in range(8)
+)
+MOUSE_MOVE_FMT = " Move(%+3d, %+3d)"
+MOUSE_WHEEL_FMT = " Wheel(%+3d)"
+MOUSE_LINE_FMT = "[%s]%s%s%s\n"
+
+# Modifier byte and the six keycode bytes of a little-endian keyboard report
+# (byte 1 is reserved)
+KBD_REPORT_KEYS_MASK = 0xFFFFFFFFFFFF00FF
+
 
 class CynthionUSBHost:
     """Control interface for Cynthion USB Host functionality."""
@@ -51,9 +107,48 @@ class CynthionUSBHost:
     REG_MOUSE_DELTA_Y = 0x52
     REG_MOUSE_WHEEL = 0x53
     
+    # Number of async register-block reads kept in flight while monitoring
+    ASYNC_TRANSFERS = 4
+    
+    # Polling fallback: sleep steps (s) while reports are unchanged, and the
+    # interval used once no report has changed for a second
+    POLL_BACKOFF = (0.001, 0.002, 0.005, 0.01)
+    POLL_IDLE_INTERVAL = 0.05
+    
+    # HID boot protocols of the mirrored device's interrupt IN endpoints
+    HID_PROTOCOL_KEYBOARD = 0x01
+    HID_PROTOCOL_MOUSE = 0x02
+    HID_READ_TIMEOUT_MS = 100
+    
+    # Monitor output is batched in memory and written at most this often (s)
+    OUTPUT_FLUSH_INTERVAL = 0.05
+    
     def __init__(self):
         """Initialize connection to Cynthion device."""
         self.device = None
+        self._last_kbd_bits = None
+        self._last_mouse_report = None
+        self._enum_cache = None
+        self._ts_cache = (0, "")
+        self._out_lines = []
+        self._next_flush = 0.0
+        self.hid_ep_kbd = None
+        self.hid_ep_mouse = None
+        
+        # Checked by the monitor loops; the daemon points it at a test for
+        # its client hanging up
+        self.stop_requested = lambda: False
+        
+        # Block reads (bRequest 0x03) and pulses (0x04) are newer vendor
+        # requests; None until the gateware has answered or stalled one
+        self._block_reads = None
+        self._pulses = None
+        
+        # Reused by every register-path report read (see read_keyboard_report)
+        self._kbd_buf = usb.util.create_buffer(8)
+        self._kbd_view = memoryview(self._kbd_buf)
+        self._mouse_buf = usb.util.create_buffer(4)
+        
         self.connect()
     
     def connect(self) -> bool:
@@ -79,6 +174,72 @@ class CynthionUSBHost:
             print(f"Error connecting to device: {e}")
             return False
     
+    def _find_hid_endpoint(self, protocol: int):
+        """Find the HID interface with the given boot protocol and its interrupt IN endpoint."""
+        config = self.device.get_active_configuration()
+        interface = usb.util.find_descriptor(
+            config, bInterfaceClass=0x03, bInterfaceProtocol=protocol
+        )
+        if interface is None:
+            return None, None
+        
+        endpoint = usb.util.find_descriptor(
+            interface,
+            custom_match=lambda ep: (
+                usb.util.endpoint_direction(ep.bEndpointAddress) == usb.util.ENDPOINT_IN
+                and usb.util.endpoint_type(ep.bmAttributes) == usb.util.ENDPOINT_TYPE_INTR
+            )
+        )
+        return interface, endpoint
+    
+    @contextlib.contextmanager
+    def _claim_hid_endpoint(self, protocol: int):
+        """Claim the HID interrupt IN endpoint for the duration of a monitor.
+        
+        Yields None when the device exposes no such endpoint or it can't be
+        claimed. The host's HID driver is detached only while the block runs
+        and reattached afterwards, so the proxied device keeps working.
+        """
+        interface, endpoint = self._find_hid_endpoint(protocol)
+        if endpoint is None:
+            yield None
+            return
+        
+        number = interface.bInterfaceNumber
+        detached = False
+        try:
+            # The host's HID driver would otherwise consume the reports
+            if self.device.is_kernel_driver_active(number):
+                self.device.detach_kernel_driver(number)
+                detached = True
+            usb.util.claim_interface(self.device, number)
+        except usb.core.USBError as e:
+            print(f"Warning: cannot claim HID interface {number}: {e}")
+            endpoint = None
+        
+        try:
+            yield endpoint
+        finally:
+            if endpoint is not None:
+                usb.util.release_interface(self.device, number)
+            if detached:
+                try:
+                    self.device.attach_kernel_driver(number)
+                except usb.core.USBError as e:
+                    print(f"Warning: cannot reattach HID driver to interface {number}: {e}")
+    
+    def read_hid_report(self, endpoint) -> Optional[bytes]:
+        """Read one report from a HID interrupt IN endpoint (None on timeout).
+        
+        Other USB errors (e.g. the device was unplugged) are raised: retrying
+        them straight away would only spin on the same failure.
+        """
+        try:
+            return bytes(endpoint.read(endpoint.wMaxPacketSize,
+                                       timeout=self.HID_READ_TIMEOUT_MS))
+        except usb.core.USBTimeoutError:
+            return None
+    
     def write_register(self, reg_addr: int, value: int) -> bool:
         """Write a value to a control register."""
         try:
@@ -100,6 +261,53 @@ class CynthionUSBHost:
             print(f"Error writing register 0x{reg_addr:02x}: {e}")
             return False
     
+    def write_pulse(self, reg_addr: int) -> bool:
+        """Pulse a control register high for one cycle in a single transfer.
+        
+        Falls back to writing 1 then 0 on gateware that stalls the request.
+        """
+        if self._pulses is False:
+            return self._write_pulse_fallback(reg_addr)
+        try:
+            # USB control transfer to pulse a register
+            # bmRequestType: 0x40 = Host-to-device, vendor, device
+            # bRequest: 0x04 = Pulse register (self-clearing write of 1)
+            # wValue: register address
+            # wIndex: 0
+            # data: none
+            self.device.ctrl_transfer(
+                bmRequestType=0x40,
+                bRequest=0x04,
+                wValue=reg_addr,
+                wIndex=0,
+                data_or_wLength=None
+            )
+            self._pulses = True
+            return True
+        except usb.core.USBError as e:
+            if e.errno == errno.EPIPE and self._pulses is None:
+                self._pulses = False
+                return self._write_pulse_fallback(reg_addr)
+            print(f"Error pulsing register 0x{reg_addr:02x}: {e}")
+            return False
+    
+    def _write_pulse_fallback(self, reg_addr: int) -> bool:
+        """Pulse a register with separate writes of 1 and 0."""
+        if not self.write_register(reg_addr, 1):
+            return False
+        time.sleep(0.01)  # Short delay
+        return self.write_register(reg_addr, 0)
+    
+    def wait_for_register(self, reg_addr: int, value: int,
+                          tries: int = 3, interval: float = 0.005) -> bool:
+        """Poll a register until it reads back value (up to tries reads)."""
+        for attempt in range(tries):
+            if self.read_register(reg_addr) == value:
+                return True
+            if attempt + 1 < tries:
+                time.sleep(interval)
+        return False
+    
     def read_register(self, reg_addr: int) -> Optional[int]:
         """Read a value from a control register."""
         try:
@@ -121,24 +329,83 @@ class CynthionUSBHost:
             print(f"Error reading register 0x{reg_addr:02x}: {e}")
             return None
     
+    def read_register_block_into(self, base_addr: int, buffer) -> bool:
+        """Read len(buffer) control registers into a preallocated buffer.
+        
+        buffer must be an array('B') such as usb.util.create_buffer()
+        returns; pyusb fills it in place instead of allocating a new array.
+        Falls back to one read_register() per byte on gateware that stalls
+        block reads.
+        """
+        length = len(buffer)
+        if self._block_reads is False:
+            return self._read_register_block_fallback(base_addr, buffer)
+        try:
+            # USB control transfer to read a register block
+            # bmRequestType: 0xC0 = Device-to-host, vendor, device
+            # bRequest: 0x03 = Read register block
+            # wValue: first register address
+            # wIndex: number of registers
+            # data_or_wLength: buffer to fill
+            read = self.device.ctrl_transfer(
+                bmRequestType=0xC0,
+                bRequest=0x03,
+                wValue=base_addr,
+                wIndex=length,
+                data_or_wLength=buffer
+            )
+            self._block_reads = True
+            if read != length:
+                print(f"Short read at register 0x{base_addr:02x}: "
+                      f"{read}/{length} bytes")
+                return False
+            return True
+        except usb.core.USBError as e:
+            if e.errno == errno.EPIPE and self._block_reads is None:
+                self._block_reads = False
+                return self._read_register_block_fallback(base_addr, buffer)
+            print(f"Error reading registers 0x{base_addr:02x}-0x{base_addr + length - 1:02x}: {e}")
+            return False
+    
+    def _read_register_block_fallback(self, base_addr: int, buffer) -> bool:
+        """Fill buffer with one single-register read per byte."""
+        for offset in range(len(buffer)):
+            value = self.read_register(base_addr + offset)
+            if value is None:
+                return False
+            buffer[offset] = value
+        return True
+    
+    def _block_reads_supported(self) -> bool:
+        """Probe once whether the gateware answers register block reads."""
+        if self._block_reads is None:
+            self.read_register_block(self.REG_ENUM_DONE, 1)
+        return bool(self._block_reads)
+    
+    def read_register_block(self, base_addr: int, length: int) -> Optional[bytes]:
+        """Read a contiguous block of control registers in one transfer."""
+        buffer = usb.util.create_buffer(length)
+        if not self.read_register_block_into(base_addr, buffer):
+            return None
+        return buffer.tobytes()
+    
     def enable_host_mode(self) -> bool:
         """Enable USB host mode."""
+        self.invalidate_enumeration_cache()
         print("Enabling USB host mode...")
         return self.write_register(self.REG_HOST_MODE_ENABLE, 1)
     
     def disable_host_mode(self) -> bool:
         """Disable USB host mode."""
+        self.invalidate_enumeration_cache()
         print("Disabling USB host mode...")
         return self.write_register(self.REG_HOST_MODE_ENABLE, 0)
     
     def start_enumeration(self) -> bool:
         """Start USB device enumeration."""
+        self.invalidate_enumeration_cache()
         print("Starting USB enumeration...")
-        # Pulse the enumeration start register
-        if not self.write_register(self.REG_ENUM_START, 1):
-            return False
-        time.sleep(0.01)  # Short delay
-        return self.write_register(self.REG_ENUM_START, 0)
+        return self.write_pulse(self.REG_ENUM_START)
     
     def check_enumeration_status(self) -> dict:
         """Check enumeration status and return device info."""
@@ -152,68 +419,77 @@ class CynthionUSBHost:
             'mouse_active': False
         }
         
-        # Read enumeration done flag
-        done = self.read_register(self.REG_ENUM_DONE)
-        if done is not None:
-            status['done'] = (done != 0)
-        
-        # Read error flag
-        error = self.read_register(self.REG_ENUM_ERROR)
-        if error is not None:
-            status['error'] = (error != 0)
+        # Read done/error/error-code flags (0x02-0x04) in one transfer
+        enum_block = self.read_register_block(self.REG_ENUM_DONE, 3)
+        if enum_block is not None:
+            status['done'] = (enum_block[0] != 0)
+            status['error'] = (enum_block[1] != 0)
+            status['error_code'] = enum_block[2]
         
-        # Read error code
-        error_code = self.read_register(self.REG_ENUM_ERROR_CODE)
-        if error_code is not None:
-            status['error_code'] = error_code
+        enumerated = status['done'] and not status['error']
         
-        # Read VID/PID if enumeration succeeded
-        if status['done'] and not status['error']:
-            vid_lo = self.read_register(self.REG_VENDOR_ID_LO)
-            vid_hi = self.read_register(self.REG_VENDOR_ID_HI)
-            pid_lo = self.read_register(self.REG_PRODUCT_ID_LO)
-            pid_hi = self.read_register(self.REG_PRODUCT_ID_HI)
-            
-            if all(x is not None for x in [vid_lo, vid_hi, pid_lo, pid_hi]):
-                status['vendor_id'] = (vid_hi << 8) | vid_lo
-                status['product_id'] = (pid_hi << 8) | pid_lo
+        # VID/PID can't change while the device stays enumerated
+        if enumerated and self._enum_cache is not None:
+            status['vendor_id'], status['product_id'] = self._enum_cache
+        elif enumerated:
+            # Read VID/PID (0x10-0x13) if enumeration succeeded
+            id_block = self.read_register_block(self.REG_VENDOR_ID_LO, 4)
+            if id_block is not None:
+                status['vendor_id'] = (id_block[1] << 8) | id_block[0]
+                status['product_id'] = (id_block[3] << 8) | id_block[2]
+                self._enum_cache = (status['vendor_id'], status['product_id'])
+        else:
+            self._enum_cache = None
         
-        # Read keyboard active status
+        # The HID engine can raise its active flags after enumeration is
+        # done, so these are read on every call
         kbd_active = self.read_register(self.REG_KBD_ACTIVE)
         if kbd_active is not None:
             status['keyboard_active'] = (kbd_active != 0)
         
-        # Read mouse active status
         mouse_active = self.read_register(self.REG_MOUSE_ACTIVE)
         if mouse_active is not None:
             status['mouse_active'] = (mouse_active != 0)
         
         return status
     
-    def read_keyboard_report(self) -> Optional[bytes]:
-        """Read the latest keyboard report (8 bytes)."""
-        report = []
-        for i in range(8):
-            value = self.read_register(self.REG_KBD_REPORT_BASE + i)
-            if value is None:
+    def invalidate_enumeration_cache(self):
+        """Force the next status check to re-read VID/PID."""
+        self._enum_cache = None
+    
+    def read_keyboard_report(self) -> Optional[memoryview]:
+        """Read the latest keyboard report (8 bytes).
+        
+        Register reads land in a reused buffer, so the returned view is only
+        valid until the next call.
+        """
+        if self.hid_ep_kbd is not None:
+            report = self.read_hid_report(self.hid_ep_kbd)
+            if report is None or len(report) < 8:
                 return None
-            report.append(value)
-        return bytes(report)
+            return memoryview(report)[:8]
+        
+        if not self.read_register_block_into(self.REG_KBD_REPORT_BASE, self._kbd_buf):
+            return None
+        return self._kbd_view
     
     def read_mouse_report(self) -> Optional[dict]:
         """Read the latest mouse report."""
-        buttons = self.read_register(self.REG_MOUSE_BUTTONS)
-        delta_x_raw = self.read_register(self.REG_MOUSE_DELTA_X)
-        delta_y_raw = self.read_register(self.REG_MOUSE_DELTA_Y)
-        wheel_raw = self.read_register(self.REG_MOUSE_WHEEL)
+        if self.hid_ep_mouse is not None:
+            block = self.read_hid_report(self.hid_ep_mouse)
+            if block is None or len(block) < 3:
+                return None
+            # Boot mice may omit the wheel byte
+            return self.decode_mouse_report(block[:4].ljust(4, b'\x00'))
         
-        if any(x is None for x in [buttons, delta_x_raw, delta_y_raw, wheel_raw]):
+        if not self.read_register_block_into(self.REG_MOUSE_BUTTONS, self._mouse_buf):
             return None
-        
-        # Convert to signed values
-        delta_x = delta_x_raw if delta_x_raw < 128 else delta_x_raw - 256
-        delta_y = delta_y_raw if delta_y_raw < 128 else delta_y_raw - 256
-        wheel = wheel_raw if wheel_raw < 128 else wheel_raw - 256
+        return self.decode_mouse_report(self._mouse_buf)
+    
+    def decode_mouse_report(self, block: bytes) -> dict:
+        """Decode a 4-byte mouse register block (buttons, X, Y, wheel)."""
+        # Buttons are unsigned, X/Y/wheel are signed 8-bit deltas
+        buttons, delta_x, delta_y, wheel = struct.unpack('<Bbbb', block)
         
         return {
             'buttons': buttons,
@@ -230,40 +506,18 @@ class CynthionUSBHost:
         if len(report) != 8:
             return {}
         
-        modifier_names = {
-            0x01: "LEFT_CTRL",
-            0x02: "LEFT_SHIFT",
-            0x04: "LEFT_ALT",
-            0x08: "LEFT_GUI",
-            0x10: "RIGHT_CTRL",
-            0x20: "RIGHT_SHIFT",
-            0x40: "RIGHT_ALT",
-            0x80: "RIGHT_GUI"
-        }
-        
-        # HID Usage Table keycodes (simplified)
-        keycode_names = {
-            0x04: "A", 0x05: "B", 0x06: "C", 0x07: "D", 0x08: "E", 0x09: "F",
-            0x0A: "G", 0x0B: "H", 0x0C: "I", 0x0D: "J", 0x0E: "K", 0x0F: "L",
-            0x10: "M", 0x11: "N", 0x12: "O", 0x13: "P", 0x14: "Q", 0x15: "R",
-            0x16: "S", 0x17: "T", 0x18: "U", 0x19: "V", 0x1A: "W", 0x1B: "X",
-            0x1C: "Y", 0x1D: "Z",
-            0x1E: "1", 0x1F: "2", 0x20: "3", 0x21: "4", 0x22: "5",
-            0x23: "6", 0x24: "7", 0x25: "8", 0x26: "9", 0x27: "0",
-            0x28: "ENTER", 0x29: "ESC", 0x2A: "BACKSPACE", 0x2B: "TAB",
-            0x2C: "SPACE", 0x39: "CAPS_LOCK"
-        }
+        # Fast path: no modifiers and no keys held (one 64-bit test)
+        if not int.from_bytes(report, 'little') & KBD_REPORT_KEYS_MASK:
+            return {
+                'modifiers': [],
+                'keys': [],
+                'raw': report.hex()
+            }
         
-        modifiers = []
-        for bit, name in modifier_names.items():
-            if report[0] & bit:
-                modifiers.append(name)
+        modifiers = [MODIFIER_NAMES[bit] for bit in range(8) if report[0] >> bit & 1]
         
-        keys = []
-        for i in range(2, 8):  # Bytes 2-7 contain keycodes
-            if report[i] != 0:
-                key_name = keycode_names.get(report[i], f"KEY_{report[i]:02x}")
-                keys.append(key_name)
+        # Bytes 2-7 contain keycodes
+        keys = [KEYCODE_NAMES[code] for code in report[2:8] if code]
         
         return {
             'modifiers': modifiers,
@@ -289,104 +543,455 @@ class CynthionUSBHost:
         
         print("=" * 25 + "\n")
     
-    def monitor_keyboard(self, duration: Optional[int] = None):
-        """Monitor keyboard events."""
-        print("Monitoring keyboard events... (Ctrl+C to stop)")
-        print("Waiting for key presses...\n")
+    def _poll_reports(self, read_report, handle_report, duration: Optional[int],
+                      backoff: bool = True):
+        """Synchronously poll read_report() and pass each report to handle_report().
         
+        Polls back-to-back while reports keep changing and backs off through
+        POLL_BACKOFF once they stop, dropping to POLL_IDLE_INTERVAL after a
+        second without input. Pass backoff=False when read_report() blocks
+        on an interrupt endpoint, which paces the loop by itself.
+        """
         start_time = time.time()
-        last_report = None
+        last_change = start_time
+        idle_count = 0
+        
+        while True:
+            now = time.time()
+            
+            # Check duration limit
+            if duration and (now - start_time) > duration:
+                break
+            if self.stop_requested():
+                break
+            
+            self._flush_output()
+            report = read_report()
+            if report is not None and handle_report(report):
+                # Busy period: poll again straight away
+                last_change = now
+                idle_count = 0
+                continue
+            
+            if not backoff:
+                continue
+            
+            idle_count += 1
+            if now - last_change > 1.0:
+                time.sleep(self.POLL_IDLE_INTERVAL)
+            else:
+                step = min(idle_count // 4, len(self.POLL_BACKOFF) - 1)
+                time.sleep(self.POLL_BACKOFF[step])
+    
+    def _stream_register_block(self, base_addr: int, length: int, handle_block,
+                               duration: Optional[int]):
+        """Stream register-block reads through libusb async transfers.
         
+        ASYNC_TRANSFERS control transfers are kept in flight; each completion
+        callback hands the block to handle_block() and resubmits itself, so
+        USB latency overlaps with decoding instead of being slept through.
+        """
+        context = usb1.USBContext()
+        handle = context.openByVendorIDAndProductID(self.VENDOR_ID, self.PRODUCT_ID)
+        if handle is None:
+            context.close()
+            print("Error: Cynthion device not found for async monitoring")
+            return
+        
+        stopping = False
+        in_flight = 0
+        
+        def on_transfer(transfer):
+            nonlocal in_flight
+            status = transfer.getStatus()
+            if status == usb1.TRANSFER_COMPLETED:
+                if transfer.getActualLength() == length:
+                    handle_block(bytes(transfer.getBuffer()[:length]))
+            elif status != usb1.TRANSFER_TIMED_OUT:
+                # Cancelled, stalled or device gone: retire this slot
+                in_flight -= 1
+                return
+            if stopping:
+                in_flight -= 1
+                return
+            try:
+                transfer.submit()
+            except usb1.USBError:
+                in_flight -= 1
+        
+        transfers = []
+        for _ in range(self.ASYNC_TRANSFERS):
+            transfer = handle.getTransfer()
+            # Same request as read_register_block(): 0xC0 / bRequest 0x03
+            transfer.setControl(0xC0, 0x03, base_addr, length, length,
+                                callback=on_transfer, timeout=1000)
+            transfers.append(transfer)
+        
+        # Sleep on libusb's own file descriptors (epoll on Linux) so the loop
+        # only wakes when a transfer completes or libusb has a timeout due
+        selector = selectors.DefaultSelector()
+        for fd, poll_events in context.getPollFDList():
+            events = 0
+            if poll_events & select.POLLIN:
+                events |= selectors.EVENT_READ
+            if poll_events & select.POLLOUT:
+                events |= selectors.EVENT_WRITE
+            if events:
+                selector.register(fd, events)
+        
+        start_time = time.time()
         try:
-            while True:
-                # Check duration limit
-                if duration and (time.time() - start_time) > duration:
-                    break
+            for transfer in transfers:
+                transfer.submit()
+                in_flight += 1
+            
+            while in_flight and not self.stop_requested():
+                # None when libusb tracks its timeouts through a timerfd
+                timeout = context.getNextTimeout()
                 
-                # Read keyboard report
-                report = self.read_keyboard_report()
-                if report is None:
-                    time.sleep(0.01)
-                    continue
+                # Check duration limit
+                if duration:
+                    remaining = start_time + duration - time.time()
+                    if remaining <= 0:
+                        break
+                    timeout = remaining if timeout is None else min(timeout, remaining)
                 
-                # Check if report changed (key press/release)
-                if report != last_report:
-                    decoded = self.decode_keyboard_report(report)
-                    
-                    # Print key events
-                    if decoded['modifiers'] or decoded['keys']:
-                        mods_str = "+".join(decoded['modifiers']) if decoded['modifiers'] else ""
-                        keys_str = " ".join(decoded['keys']) if decoded['keys'] else ""
-                        
-                        if mods_str and keys_str:
-                            print(f"[{time.strftime('%H:%M:%S')}] {mods_str} + {keys_str}")
-                        elif mods_str:
-                            print(f"[{time.strftime('%H:%M:%S')}] {mods_str}")
-                        elif keys_str:
-                            print(f"[{time.strftime('%H:%M:%S')}] {keys_str}")
-                    else:
-                        # All keys released
-                        if last_report and (last_report[0] != 0 or any(last_report[2:8])):
-                            print(f"[{time.strftime('%H:%M:%S')}] (released)")
-                    
-                    last_report = report
+                # Wake up in time to write out batched output
+                if self._out_lines:
+                    until_flush = max(0.0, self._next_flush - time.monotonic())
+                    timeout = until_flush if timeout is None else min(timeout, until_flush)
                 
-                time.sleep(0.01)  # 100Hz polling
+                selector.select(timeout)
+                context.handleEventsTimeout(0)
+                self._flush_output()
+        finally:
+            selector.close()
+            stopping = True
+            for transfer in transfers:
+                if transfer.isSubmitted():
+                    try:
+                        transfer.cancel()
+                    except usb1.USBErrorNotFound:
+                        pass
+            while in_flight:
+                context.handleEvents()
+            handle.close()
+            context.close()
+    
+    def _emit(self, line: str):
+        """Queue a line of monitor output for the next _flush_output()."""
+        self._out_lines.append(line)
+    
+    def _flush_output(self, force: bool = False):
+        """Write queued monitor output if OUTPUT_FLUSH_INTERVAL has passed."""
+        if not self._out_lines:
+            return
+        now = time.monotonic()
+        if force or now >= self._next_flush:
+            text = "".join(self._out_lines)
+            self._out_lines.clear()
+            self._next_flush = now + self.OUTPUT_FLUSH_INTERVAL
+            sys.stdout.write(text)
+            sys.stdout.flush()
+    
+    def _timestamp(self) -> str:
+        """Return the current time as HH:MM:SS, formatted at most once a second."""
+        now = int(time.time())
+        if self._ts_cache[0] != now:
+            self._ts_cache = (now, time.strftime('%H:%M:%S', time.localtime(now)))
+        return self._ts_cache[1]
+    
+    def _on_keyboard_report(self, report: bytes) -> bool:
+        """Print key events if the report differs from the previous one.
+        
+        Returns True if the report changed.
+        """
+        # Compare the 8-byte report as a single 64-bit integer
+        report_bits = int.from_bytes(report, 'little')
+        last_bits = self._last_kbd_bits
+        
+        # Check if report changed (key press/release)
+        if report_bits == last_bits:
+            return False
+        
+        decoded = self.decode_keyboard_report(report)
+        
+        # Print key events
+        if decoded['modifiers'] or decoded['keys']:
+            mods_str = "+".join(decoded['modifiers']) if decoded['modifiers'] else ""
+            keys_str = " ".join(decoded['keys']) if decoded['keys'] else ""
+            
+            if mods_str and keys_str:
+                self._emit(f"[{self._timestamp()}] {mods_str} + {keys_str}\n")
+            elif mods_str:
+                self._emit(f"[{self._timestamp()}] {mods_str}\n")
+            elif keys_str:
+                self._emit(f"[{self._timestamp()}] {keys_str}\n")
+        else:
+            # All keys released
+            if last_bits is not None and last_bits & KBD_REPORT_KEYS_MASK:
+                self._emit(f"[{self._timestamp()}] (released)\n")
+        
+        self._last_kbd_bits = report_bits
+        return True
+    
+    def _on_mouse_report(self, report: dict) -> bool:
+        """Print mouse events if the report differs from the previous one.
+        
+        Returns True if the report changed.
+        """
+        # Check if report changed
+        report_tuple = (report['buttons'], report['delta_x'], report['delta_y'], report['wheel'])
+        if report_tuple == self._last_mouse_report:
+            return False
+        
+        buttons, delta_x, delta_y, wheel = report_tuple
+        
+        # Each piece carries its own leading space so empty ones drop out
+        buttons_str = MOUSE_BUTTON_LABELS[buttons & 0x07]
+        move_str = MOUSE_MOVE_FMT % (delta_x, delta_y) if delta_x or delta_y else ""
+        wheel_str = MOUSE_WHEEL_FMT % wheel if wheel else ""
+        
+        if buttons_str or move_str or wheel_str:
+            self._emit(MOUSE_LINE_FMT % (self._timestamp(), buttons_str, move_str, wheel_str))
+        
+        self._last_mouse_report = report_tuple
+        return True
+    
+    def monitor_keyboard(self, duration: Optional[int] = None):
+        """Monitor keyboard events."""
+        print("Monitoring keyboard events... (Ctrl+C to stop)")
+        print("Waiting for key presses...\n")
+        
+        self._last_kbd_bits = None
+        
+        try:
+            # Prefer the HID interrupt endpoint over register polling if exposed
+            with self._claim_hid_endpoint(self.HID_PROTOCOL_KEYBOARD) as endpoint:
+                self.hid_ep_kbd = endpoint
+                if endpoint is not None:
+                    self._poll_reports(self.read_keyboard_report,
+                                       self._on_keyboard_report, duration, backoff=False)
+                elif usb1 is not None and self._block_reads_supported():
+                    self._stream_register_block(self.REG_KBD_REPORT_BASE, 8,
+                                                self._on_keyboard_report, duration)
+                else:
+                    self._poll_reports(self.read_keyboard_report,
+                                       self._on_keyboard_report, duration)
                 
         except KeyboardInterrupt:
+            self._flush_output(force=True)
             print("\n\nStopped monitoring.")
+        except usb.core.USBError as e:
+            self._flush_output(force=True)
+            print(f"\nError reading HID endpoint, stopped monitoring: {e}")
+        finally:
+            self.hid_ep_kbd = None
+            self._flush_output(force=True)
     
     def monitor_mouse(self, duration: Optional[int] = None):
         """Monitor mouse events."""
         print("Monitoring mouse events... (Ctrl+C to stop)")
         print("Waiting for mouse movement...\n")
         
-        start_time = time.time()
-        last_report = None
+        self._last_mouse_report = None
         
         try:
-            while True:
-                # Check duration limit
-                if duration and (time.time() - start_time) > duration:
-                    break
+            # Prefer the HID interrupt endpoint over register polling if exposed
+            with self._claim_hid_endpoint(self.HID_PROTOCOL_MOUSE) as endpoint:
+                self.hid_ep_mouse = endpoint
+                if endpoint is not None:
+                    self._poll_reports(self.read_mouse_report,
+                                       self._on_mouse_report, duration, backoff=False)
+                elif usb1 is not None and self._block_reads_supported():
+                    self._stream_register_block(
+                        self.REG_MOUSE_BUTTONS, 4,
+                        lambda block: self._on_mouse_report(self.decode_mouse_report(block)),
+                        duration)
+                else:
+                    self._poll_reports(self.read_mouse_report,
+                                       self._on_mouse_report, duration)
                 
-                # Read mouse report
-                report = self.read_mouse_report()
-                if report is None:
-                    time.sleep(0.01)
+        except KeyboardInterrupt:
+            self._flush_output(force=True)
+            print("\n\nStopped monitoring.")
+        except usb.core.USBError as e:
+            self._flush_output(force=True)
+            print(f"\nError reading HID endpoint, stopped monitoring: {e}")
+        finally:
+            self.hid_ep_mouse = None
+            self._flush_output(force=True)
+
+
+# Unix socket of the daemon process holding the device open
+DAEMON_SOCKET = '/tmp/cynthion.sock'
+
+
+def cmd_enable(controller: CynthionUSBHost, args):
+    """Enable host mode and confirm it by read-back."""
+    if controller.enable_host_mode():
+        if not controller.wait_for_register(controller.REG_HOST_MODE_ENABLE, 1):
+            print("⚠ Host mode enable not confirmed by read-back")
+
+
+def cmd_disable(controller: CynthionUSBHost, args):
+    """Disable host mode and confirm it by read-back."""
+    if controller.disable_host_mode():
+        if not controller.wait_for_register(controller.REG_HOST_MODE_ENABLE, 0):
+            print("⚠ Host mode disable not confirmed by read-back")
+
+
+def cmd_enumerate(controller: CynthionUSBHost, args):
+    """Start enumeration and wait for it to finish."""
+    controller.start_enumeration()
+    print("Waiting for enumeration to complete...")
+    
+    # Wait up to 5 seconds for enumeration
+    deadline = time.monotonic() + 5.0
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = controller.check_enumeration_status()
+        if status['done']:
+            print("✓ Enumeration complete!")
+            if status['vendor_id'] and status['product_id']:
+                print(f"  Device: {status['vendor_id']:04x}:{status['product_id']:04x}")
+            break
+        if status['error']:
+            print(f"✗ Enumeration failed with error code 0x{status['error_code']:02x}")
+            break
+    else:
+        print("⚠ Enumeration timeout (device not responding?)")
+
+
+def cmd_status(controller: CynthionUSBHost, args):
+    """Print the current status."""
+    controller.print_status()
+
+
+def cmd_monitor(controller: CynthionUSBHost, args):
+    """Monitor the enumerated keyboard or mouse."""
+    # Auto-detect device type
+    status = controller.check_enumeration_status()
+    if status['keyboard_active']:
+        print("Detected keyboard, starting keyboard monitor...")
+        controller.monitor_keyboard(args.duration)
+    elif status['mouse_active']:
+        print("Detected mouse, starting mouse monitor...")
+        controller.monitor_mouse(args.duration)
+    else:
+        print("No HID device detected. Please enumerate a device first.")
+
+
+# Subcommand name -> (handler, help)
+COMMANDS = {
+    'enable': (cmd_enable, 'Enable USB host mode'),
+    'disable': (cmd_disable, 'Disable USB host mode'),
+    'enumerate': (cmd_enumerate, 'Start device enumeration'),
+    'status': (cmd_status, 'Get current status'),
+    'monitor': (cmd_monitor, 'Monitor keyboard/mouse events (Ctrl+C to stop)'),
+}
+
+
+def serve_daemon(controller: CynthionUSBHost, socket_path: str):
+    """Keep the device open and run actions sent by CLI clients over a Unix socket.
+    
+    Each connection sends one JSON line {"command": name, "duration": N};
+    the command's output is streamed back until the connection closes.
+    """
+    # Only remove a stale socket; a live daemon still accepts connections
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except FileNotFoundError:
+        pass
+    except ConnectionRefusedError:
+        os.unlink(socket_path)  # Stale socket from a previous daemon
+    else:
+        print(f"Error: a daemon is already listening on {socket_path}")
+        sys.exit(1)
+    finally:
+        probe.close()
+    
+    # Anyone who can connect can drive the device, so create the socket
+    # owner-only rather than tightening it after bind
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    server.listen(1)
+    print(f"Daemon listening on {socket_path} (Ctrl+C to stop)")
+    
+    try:
+        while True:
+            conn, _ = server.accept()
+            rfile = conn.makefile('r', encoding='utf-8')
+            wfile = conn.makefile('w', encoding='utf-8')
+            
+            # Clients half-close after sending their request; POLLHUP (always
+            # reported) means they closed for good, e.g. Ctrl+C during monitor
+            hangup = select.poll()
+            hangup.register(conn, 0)
+            controller.stop_requested = lambda: bool(hangup.poll(0))
+            try:
+                try:
+                    request = json.loads(rfile.readline())
+                    handler, _ = COMMANDS[request['command']]
+                    args = argparse.Namespace(**request)
+                except (ValueError, KeyError, TypeError) as e:
+                    wfile.write(f"Error: bad daemon request: {e}\n")
                     continue
-                
-                # Check if report changed
-                report_tuple = (report['buttons'], report['delta_x'], report['delta_y'], report['wheel'])
-                if report_tuple != last_report:
-                    # Build status string
-                    parts = []
-                    
-                    # Buttons
-                    if report['left_button']:
-                        parts.append("LEFT")
-                    if report['right_button']:
-                        parts.append("RIGHT")
-                    if report['middle_button']:
-                        parts.append("MIDDLE")
-                    
-                    # Movement
-                    if report['delta_x'] != 0 or report['delta_y'] != 0:
-                        parts.append(f"Move({report['delta_x']:+3d}, {report['delta_y']:+3d})")
-                    
-                    # Wheel
-                    if report['wheel'] != 0:
-                        parts.append(f"Wheel({report['wheel']:+3d})")
-                    
-                    if parts:
-                        print(f"[{time.strftime('%H:%M:%S')}] {' '.join(parts)}")
-                    
-                    last_report = report_tuple
-                
-                time.sleep(0.01)  # 100Hz polling
-                
+                with contextlib.redirect_stdout(wfile):
+                    handler(controller, args)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client went away, e.g. Ctrl+C during monitor
+            except Exception as e:
+                # One failed request (e.g. a USBError) must not stop the daemon
+                print(f"Error handling {request['command']!r}: {e}")
+                try:
+                    wfile.write(f"Error: {e}\n")
+                except OSError:
+                    pass
+            finally:
+                controller.stop_requested = lambda: False
+                try:
+                    wfile.close()
+                except OSError:
+                    pass
+                rfile.close()
+                conn.close()
+    except KeyboardInterrupt:
+        print("\nDaemon stopped.")
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+
+def run_via_daemon(socket_path: str, args) -> bool:
+    """Forward a command to a running daemon; False if no daemon is listening."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        return False
+    
+    with client:
+        request = {'command': args.command, 'duration': getattr(args, 'duration', None)}
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        
+        try:
+            while True:
+                data = client.recv(4096)
+                if not data:
+                    break
+                sys.stdout.buffer.write(data)
+                sys.stdout.flush()
         except KeyboardInterrupt:
             print("\n\nStopped monitoring.")
+    return True
 
 
 def main():
@@ -394,27 +999,29 @@ def main():
         description="Control HurricaneFPGA USB Host Mode",
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
+    parser.add_argument('--socket', default=DAEMON_SOCKET, metavar='PATH',
+                       help=f'Daemon socket path (default: {DAEMON_SOCKET})')
     
-    parser.add_argument('--enable', action='store_true',
-                       help='Enable USB host mode')
-    parser.add_argument('--disable', action='store_true',
-                       help='Disable USB host mode')
-    parser.add_argument('--enumerate', action='store_true',
-                       help='Start device enumeration')
-    parser.add_argument('--status', action='store_true',
-                       help='Get current status')
-    parser.add_argument('--monitor', action='store_true',
-                       help='Monitor keyboard events (Ctrl+C to stop)')
-    parser.add_argument('--duration', type=int, metavar='SECONDS',
-                       help='Monitor duration in seconds (default: infinite)')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if name == 'monitor':
+            subparser.add_argument('--duration', type=int, metavar='SECONDS',
+                                   help='Monitor duration in seconds (default: infinite)')
+    subparsers.add_parser('daemon',
+                          help='Keep the device open and serve other invocations over a socket')
     
     args = parser.parse_args()
     
-    # Check if any action specified
-    if not any([args.enable, args.disable, args.enumerate, args.status, args.monitor]):
+    # Check if any command specified
+    if args.command is None:
         parser.print_help()
         sys.exit(1)
     
+    # Reuse a running daemon's open device instead of reconnecting
+    if args.command != 'daemon' and run_via_daemon(args.socket, args):
+        return
+    
     # Create controller instance
     try:
         controller = CynthionUSBHost()
@@ -422,48 +1029,11 @@ def main():
         print(f"Failed to initialize controller: {e}")
         sys.exit(1)
     
-    # Execute requested actions
-    if args.enable:
-        controller.enable_host_mode()
-        time.sleep(0.1)
-    
-    if args.disable:
-        controller.disable_host_mode()
-        time.sleep(0.1)
-    
-    if args.enumerate:
-        controller.start_enumeration()
-        print("Waiting for enumeration to complete...")
-        
-        # Wait up to 5 seconds for enumeration
-        for _ in range(50):
-            time.sleep(0.1)
-            status = controller.check_enumeration_status()
-            if status['done']:
-                print("✓ Enumeration complete!")
-                if status['vendor_id'] and status['product_id']:
-                    print(f"  Device: {status['vendor_id']:04x}:{status['product_id']:04x}")
-                break
-            if status['error']:
-                print(f"✗ Enumeration failed with error code 0x{status['error_code']:02x}")
-                break
-        else:
-            print("⚠ Enumeration timeout (device not responding?)")
-    
-    if args.status:
-        controller.print_status()
-    
-    if args.monitor:
-        # Auto-detect device type
-        status = controller.check_enumeration_status()
-        if status['keyboard_active']:
-            print("Detected keyboard, starting keyboard monitor...")
-            controller.monitor_keyboard(args.duration)
-        elif status['mouse_active']:
-            print("Detected mouse, starting mouse monitor...")
-            controller.monitor_mouse(args.duration)
-        else:
-            print("No HID device detected. Please enumerate a device first.")
+    if args.command == 'daemon':
+        serve_daemon(controller, args.socket)
+    else:
+        handler, _ = COMMANDS[args.command]
+        handler(controller, args)
 
 
 if __name__ == '__main__':
@@ -11,7 +11,7 @@ import sys
 
 # Example HID descriptors for testing
 
-MOUSE_DESCRIPTOR = [
+MOUSE_DESCRIPTOR = bytes((
     0x05, 0x01,        # Usage Page (Generic Desktop)
     0x09, 0x02,        # Usage (Mouse)
     0xA1, 0x01,        # Collection (Application)
@@ -39,9 +39,9 @@ MOUSE_DESCRIPTOR = [
     0x81, 0x06,        #     Input (Data, Variable, Relative)
     0xC0,              #   End Collection
     0xC0,              # End Collection
-]
+))
 
-KEYBOARD_DESCRIPTOR = [
+KEYBOARD_DESCRIPTOR = bytes((
     0x05, 0x01,        # Usage Page (Generic Desktop)
     0x09, 0x06,        # Usage (Keyboard)
     0xA1, 0x01,        # Collection (Application)
@@ -74,9 +74,9 @@ KEYBOARD_DESCRIPTOR = [
     0x29, 0x65,        #   Usage Maximum (101)
     0x81, 0x00,        #   Input (Data, Array) - Key array
     0xC0,              # End Collection
-]
+))
 
-GAMEPAD_DESCRIPTOR = [
+GAMEPAD_DESCRIPTOR = bytes((
     0x05, 0x01,        # Usage Page (Generic Desktop)
     0x09, 0x05,        # Usage (Game Pad)
     0xA1, 0x01,        # Collection (Application)
@@ -99,30 +99,25 @@ GAMEPAD_DESCRIPTOR = [
     0x95, 0x04,        #   Report Count (4)
     0x81, 0x02,        #   Input (Data, Variable, Absolute)
     0xC0,              # End Collection
-]
+))
 
 class DescriptorTester:
     def __init__(self, port='/dev/ttyACM0', baudrate=115200):
-        self.ser = serial.Serial(port, baudrate, timeout=1)
+        # read() waits up to `timeout` for a reply to start, then returns once
+        # the line goes quiet for `inter_byte_timeout` (replies are one burst)
+        self.ser = serial.Serial(port, baudrate, timeout=0.5, inter_byte_timeout=0.01)
         time.sleep(0.5)  # Wait for device to be ready
         
     def send_command(self, cmd):
         """Send a command and wait for response"""
         self.ser.write(cmd.encode() + b'\n')
-        time.sleep(0.1)
-        
-        # Read response
-        response = b''
-        while self.ser.in_waiting:
-            response += self.ser.read(self.ser.in_waiting)
-            time.sleep(0.05)
-        
+        response = self.ser.read(4096)
         return response.decode('utf-8', errors='ignore')
     
     def add_descriptor(self, device_addr, interface, descriptor_bytes):
         """Add a descriptor to the cache"""
-        # Convert bytes to hex string
-        hex_str = ','.join(f'{b:02x}' for b in descriptor_bytes)
+        # Convert bytes to comma-separated hex string (any bytes-like, no copy)
+        hex_str = memoryview(descriptor_bytes).hex(',')
         
         cmd = f"nozen.descriptor.add({device_addr},{interface}){{{hex_str}}}"
         print(f"Adding descriptor: addr={device_addr} iface={interface} size={len(descriptor_bytes)} bytes")
@@ -181,6 +176,16 @@ class DescriptorTester:
         """Close serial connection"""
         self.ser.close()
 
+def parse_hex_bytes(text):
+    """Parse descriptor bytes such as "05 01 09 02", "05,01" or "0x05, 0x01"."""
+    values = []
+    for token in text.replace(',', ' ').split():
+        value = int(token, 16)  # Accepts an optional 0x prefix
+        if not 0 <= value <= 0xFF:
+            raise ValueError(f"byte out of range: {token!r}")
+        values.append(value)
+    return bytes(values)
+
 def main():
     parser = argparse.ArgumentParser(description='HID Descriptor Parser Test Tool')
     parser.add_argument('--port', default='/dev/ttyACM0', help='Serial port (default: /dev/ttyACM0)')
@@ -195,18 +200,24 @@ def main():
     
     args = parser.parse_args()
     
+    if args.add:
+        addr, iface, hex_file = args.add
+        try:
+            addr, iface = int(addr), int(iface)
+            with open(hex_file, 'r') as f:
+                descriptor = parse_hex_bytes(f.read())
+        except OSError as e:
+            parser.error(f"cannot read {hex_file}: {e}")
+        except ValueError as e:
+            parser.error(f"invalid --add argument: {e}")
+    
     try:
         tester = DescriptorTester(args.port, args.baudrate)
         
         if args.stats:
             tester.get_stats()
         elif args.add:
-            addr, iface, hex_file = args.add
-            with open(hex_file, 'r') as f:
-                hex_data = f.read().strip()
-                # Parse hex string (supports formats: "05 01 09 02" or "05,01,09,02")
-                hex_bytes = [int(b, 16) for b in hex_data.replace(',', ' ').split()]
-                tester.add_descriptor(int(addr), int(iface), hex_bytes)
+            tester.add_descriptor(addr, iface, descriptor)
         elif args.get:
             addr, iface = args.get
             tester.get_descriptor(addr, iface)
@@ -4,79 +4,116 @@ Unit tests for HID descriptor parsing functionality
 Tests the descriptor validation without requiring hardware
 """
 
+import os
+import struct
 import unittest
 import sys
 
+from test_injection import (
+    LINE_MAX, SCANCODES, _RECOIL_DELETE_FMT, pack_pattern, recoil_add_cmd,
+)
+
+
+# Standard mouse descriptor
+_MOUSE_DESC = bytes([
+    0x05, 0x01,  # Usage Page (Generic Desktop)
+    0x09, 0x02,  # Usage (Mouse)
+    0xA1, 0x01,  # Collection (Application)
+    0x09, 0x01,  # Usage (Pointer)
+    0xA1, 0x00,  # Collection (Physical)
+    0x05, 0x09,  # Usage Page (Button)
+    0x19, 0x01,  # Usage Minimum (1)
+    0x29, 0x03,  # Usage Maximum (3)
+    0x15, 0x00,  # Logical Minimum (0)
+    0x25, 0x01,  # Logical Maximum (1)
+    0x95, 0x03,  # Report Count (3)
+    0x75, 0x01,  # Report Size (1)
+    0x81, 0x02,  # Input (Data, Variable, Absolute)
+    0xC0,        # End Collection
+    0xC0,        # End Collection
+])
+
+# Keyboard descriptor (modifier byte only)
+_KEYBOARD_DESC = bytes([
+    0x05, 0x01,  # Usage Page (Generic Desktop)
+    0x09, 0x06,  # Usage (Keyboard)
+    0xA1, 0x01,  # Collection (Application)
+    0x05, 0x07,  # Usage Page (Keyboard)
+    0x19, 0xE0,  # Usage Minimum (Left Control)
+    0x29, 0xE7,  # Usage Maximum (Right GUI)
+    0x15, 0x00,  # Logical Minimum (0)
+    0x25, 0x01,  # Logical Maximum (1)
+    0x75, 0x01,  # Report Size (1)
+    0x95, 0x08,  # Report Count (8)
+    0x81, 0x02,  # Input (Data, Variable, Absolute)
+    0xC0,        # End Collection
+])
+
+# Simple descriptor with nested collections
+_NESTED_DESC = bytes([
+    0xA1, 0x01,  # Collection (Application)
+    0xA1, 0x00,  # Collection (Physical)
+    0xC0,        # End Collection
+    0xC0,        # End Collection
+])
+
+
+def _validate_descriptor(desc):
+    """Check that Collection and End Collection items balance"""
+    if desc.count(b'\xA1') != desc.count(b'\xC0'):
+        raise ValueError("unbalanced collections in test descriptor")
+
+
+# Catch a broken fixture at import rather than in whichever test reads it
+for _desc in (_MOUSE_DESC, _KEYBOARD_DESC, _NESTED_DESC):
+    _validate_descriptor(_desc)
+
+
+def _swap_ctrl_gui(mods):
+    """Swap the Ctrl and GUI bits on both sides of a modifier byte"""
+    ctrl = mods & 0x11  # LCTRL | RCTRL
+    gui = mods & 0x88   # LGUI | RGUI
+    return (mods & ~0x99) | (ctrl << 3) | (gui >> 3)
+
+
+# Ctrl<->GUI swap for every modifier byte, indexed by the raw byte
+_SWAP_CTRL_GUI = bytes(_swap_ctrl_gui(m) for m in range(256))
+
 
 class TestHIDDescriptorParsing(unittest.TestCase):
     """Test HID descriptor parsing and validation"""
     
     def test_mouse_descriptor_structure(self):
         """Test that mouse descriptor has correct structure"""
-        # Standard mouse descriptor
-        mouse_desc = [
-            0x05, 0x01,  # Usage Page (Generic Desktop)
-            0x09, 0x02,  # Usage (Mouse)
-            0xA1, 0x01,  # Collection (Application)
-            0x09, 0x01,  # Usage (Pointer)
-            0xA1, 0x00,  # Collection (Physical)
-            0x05, 0x09,  # Usage Page (Button)
-            0x19, 0x01,  # Usage Minimum (1)
-            0x29, 0x03,  # Usage Maximum (3)
-            0x15, 0x00,  # Logical Minimum (0)
-            0x25, 0x01,  # Logical Maximum (1)
-            0x95, 0x03,  # Report Count (3)
-            0x75, 0x01,  # Report Size (1)
-            0x81, 0x02,  # Input (Data, Variable, Absolute)
-            0xC0,        # End Collection
-            0xC0,        # End Collection
-        ]
+        view = memoryview(_MOUSE_DESC)
         
-        # Basic structure validation
-        self.assertGreater(len(mouse_desc), 0)
-        self.assertEqual(mouse_desc[0], 0x05)  # Usage Page tag
-        self.assertEqual(mouse_desc[1], 0x01)  # Generic Desktop
-        self.assertEqual(mouse_desc[2], 0x09)  # Usage tag
-        self.assertEqual(mouse_desc[3], 0x02)  # Mouse usage
+        # Basic structure validation: Usage Page (Generic Desktop), Usage (Mouse)
+        self.assertGreater(len(view), 0)
+        self.assertEqual(view[:4], b"\x05\x01\x09\x02")
+        self.assertEqual(view[-2:], b"\xC0\xC0")  # Both collections closed
         
     def test_keyboard_descriptor_structure(self):
         """Test that keyboard descriptor has correct structure"""
-        keyboard_desc = [
-            0x05, 0x01,  # Usage Page (Generic Desktop)
-            0x09, 0x06,  # Usage (Keyboard)
-            0xA1, 0x01,  # Collection (Application)
-            0x05, 0x07,  # Usage Page (Keyboard)
-            0x19, 0xE0,  # Usage Minimum (Left Control)
-            0x29, 0xE7,  # Usage Maximum (Right GUI)
-            0x15, 0x00,  # Logical Minimum (0)
-            0x25, 0x01,  # Logical Maximum (1)
-            0x75, 0x01,  # Report Size (1)
-            0x95, 0x08,  # Report Count (8)
-            0x81, 0x02,  # Input (Data, Variable, Absolute)
-            0xC0,        # End Collection
-        ]
+        view = memoryview(_KEYBOARD_DESC)
         
-        self.assertGreater(len(keyboard_desc), 0)
-        self.assertEqual(keyboard_desc[0], 0x05)
-        self.assertEqual(keyboard_desc[3], 0x06)  # Keyboard usage
+        self.assertGreater(len(view), 0)
+        self.assertEqual(view[:4], b"\x05\x01\x09\x06")  # Keyboard usage
+        self.assertEqual(view[-1:], b"\xC0")
         
     def test_collection_nesting(self):
         """Test that collections are properly nested"""
-        # Simple descriptor with nested collections
-        desc = [
-            0xA1, 0x01,  # Collection (Application)
-            0xA1, 0x00,  # Collection (Physical)
-            0xC0,        # End Collection
-            0xC0,        # End Collection
-        ]
-        
         # Count collections vs end collections
-        collections = sum(1 for i in range(len(desc)) if desc[i] == 0xA1)
-        end_collections = sum(1 for i in range(len(desc)) if desc[i] == 0xC0)
+        collections = _NESTED_DESC.count(b'\xA1')
+        end_collections = _NESTED_DESC.count(b'\xC0')
         
         self.assertEqual(collections, end_collections)
         self.assertEqual(collections, 2)
         
+    def test_unbalanced_descriptor_rejected(self):
+        """Test that the fixture check rejects unbalanced collections"""
+        with self.assertRaises(ValueError):
+            _validate_descriptor(_NESTED_DESC[:-1])
+        
     def test_usage_page_values(self):
         """Test valid usage page values"""
         GENERIC_DESKTOP = 0x01
@@ -140,63 +177,61 @@ class TestCommandFormatting(unittest.TestCase):
 class TestScancodeMapping(unittest.TestCase):
     """Test HID keyboard scancode mappings"""
     
-    def setUp(self):
-        """Set up scancode mappings"""
-        self.SCANCODES = {
-            'A': 0x04, 'B': 0x05, 'C': 0x06, 'D': 0x07,
-            'E': 0x08, 'F': 0x09, 'G': 0x0A, 'H': 0x0B,
-            'I': 0x0C, 'J': 0x0D, 'K': 0x0E, 'L': 0x0F,
-            'M': 0x10, 'N': 0x11, 'O': 0x12, 'P': 0x13,
-            'Q': 0x14, 'R': 0x15, 'S': 0x16, 'T': 0x17,
-            'U': 0x18, 'V': 0x19, 'W': 0x1A, 'X': 0x1B,
-            'Y': 0x1C, 'Z': 0x1D,
-            '1': 0x1E, '2': 0x1F, '3': 0x20, '4': 0x21,
-            '5': 0x22, '6': 0x23, '7': 0x24, '8': 0x25,
-            '9': 0x26, '0': 0x27,
-            ' ': 0x2C, '\n': 0x28,
-        }
-        
     def test_letter_scancodes(self):
         """Test that letter scancodes are sequential"""
-        self.assertEqual(self.SCANCODES['A'], 0x04)
-        self.assertEqual(self.SCANCODES['Z'], 0x1D)
-        
-        # Check sequential
-        for i, letter in enumerate('ABCDEFGHIJKLMNOPQRSTUVWXYZ'):
-            expected = 0x04 + i
-            self.assertEqual(self.SCANCODES[letter], expected,
-                           f"Letter {letter} should be 0x{expected:02X}")
+        self.assertEqual(SCANCODES[ord('A')], 0x04)
+        self.assertEqual(SCANCODES[ord('Z')], 0x1D)
+        
+        # Check sequential: A-Z are contiguous in both ASCII and HID
+        self.assertEqual(SCANCODES[ord('A'):ord('Z') + 1],
+                         bytes(range(0x04, 0x1E)))
             
     def test_number_scancodes(self):
         """Test number key scancodes"""
-        self.assertEqual(self.SCANCODES['1'], 0x1E)
-        self.assertEqual(self.SCANCODES['0'], 0x27)
+        self.assertEqual(SCANCODES[ord('1')], 0x1E)
+        self.assertEqual(SCANCODES[ord('0')], 0x27)
         
     def test_special_keys(self):
         """Test special key scancodes"""
-        self.assertEqual(self.SCANCODES[' '], 0x2C)  # Space
-        self.assertEqual(self.SCANCODES['\n'], 0x28)  # Enter
+        self.assertEqual(SCANCODES[ord(' ')], 0x2C)  # Space
+        self.assertEqual(SCANCODES[ord('\n')], 0x28)  # Enter
+        self.assertEqual(SCANCODES[ord('\t')], 0x2B)  # Tab
+        
+    def test_unmapped_characters(self):
+        """Test that characters without a scancode map to 0"""
+        self.assertEqual(len(SCANCODES), 128)
+        self.assertEqual(SCANCODES[ord('a')], 0)
+        self.assertEqual(SCANCODES[0], 0)
         
     def test_all_scancodes_unique(self):
         """Test that all scancodes are unique"""
-        scancodes = list(self.SCANCODES.values())
-        self.assertEqual(len(scancodes), len(set(scancodes)),
-                        "Duplicate scancodes found")
+        # 256-bit bitset: each scancode must set a bit not already seen
+        seen = 0
+        count = 0
+        for sc in SCANCODES:
+            if not sc:
+                continue
+            bit = 1 << sc
+            self.assertEqual(seen & bit, 0, f"Duplicate scancode 0x{sc:02X}")
+            seen |= bit
+            count += 1
+        self.assertEqual(count, 39)
 
 
 class TestModifierKeys(unittest.TestCase):
     """Test keyboard modifier key bitmasks"""
     
-    def setUp(self):
+    @classmethod
+    def setUpClass(cls):
         """Set up modifier constants"""
-        self.MOD_LSHIFT = 0x02
-        self.MOD_LCTRL = 0x01
-        self.MOD_LALT = 0x04
-        self.MOD_LGUI = 0x08
-        self.MOD_RSHIFT = 0x20
-        self.MOD_RCTRL = 0x10
-        self.MOD_RALT = 0x40
-        self.MOD_RGUI = 0x80
+        cls.MOD_LSHIFT = 0x02
+        cls.MOD_LCTRL = 0x01
+        cls.MOD_LALT = 0x04
+        cls.MOD_LGUI = 0x08
+        cls.MOD_RSHIFT = 0x20
+        cls.MOD_RCTRL = 0x10
+        cls.MOD_RALT = 0x40
+        cls.MOD_RGUI = 0x80
         
     def test_modifier_values(self):
         """Test that modifiers are powers of 2"""
@@ -229,11 +264,27 @@ class TestModifierKeys(unittest.TestCase):
             self.MOD_RCTRL, self.MOD_RSHIFT, self.MOD_RALT, self.MOD_RGUI
         ]
         
-        # Check each pair doesn't overlap
-        for i, mod1 in enumerate(modifiers):
-            for mod2 in modifiers[i+1:]:
-                self.assertEqual(mod1 & mod2, 0,
-                               f"Modifiers 0x{mod1:02X} and 0x{mod2:02X} overlap")
+        # Accumulate into one mask; any shared bit is an overlap
+        mask = 0
+        for mod in modifiers:
+            self.assertEqual(mask & mod, 0,
+                           f"Modifier 0x{mod:02X} overlaps 0x{mask:02X}")
+            mask |= mod
+        self.assertEqual(mask, 0xFF)
+        
+    def test_swap_ctrl_gui_table(self):
+        """Test the Ctrl/GUI swap lookup table"""
+        self.assertEqual(_SWAP_CTRL_GUI[self.MOD_LCTRL], self.MOD_LGUI)
+        self.assertEqual(_SWAP_CTRL_GUI[self.MOD_RGUI], self.MOD_RCTRL)
+        self.assertEqual(_SWAP_CTRL_GUI[self.MOD_LSHIFT], self.MOD_LSHIFT)
+        
+        # Holding both keys must still report both after the swap
+        both = self.MOD_LCTRL | self.MOD_LGUI
+        self.assertEqual(_SWAP_CTRL_GUI[both], both)
+        
+        # Swapping twice is the identity for every modifier byte
+        self.assertEqual(bytes(_SWAP_CTRL_GUI[m] for m in _SWAP_CTRL_GUI),
+                         bytes(range(256)))
 
 
 class TestRecoilPatternFormat(unittest.TestCase):
@@ -241,39 +292,48 @@ class TestRecoilPatternFormat(unittest.TestCase):
     
     def test_recoil_add_format(self):
         """Test recoil pattern add command format"""
-        name = "ak47"
-        pattern = [10, -5, 100, 20, -10, 150]
+        wire = recoil_add_cmd("ak47", [10, -5, 100, 20, -10, 150])
         
-        pattern_str = ",".join(map(str, pattern))
-        cmd = f"nozen.recoil.add({name}){{{pattern_str}}}"
+        self.assertEqual(wire, b"nozen.recoil.add(ak47){10,-5,100,20,-10,150}\n")
+        self.assertLessEqual(len(wire) - 1, LINE_MAX)
         
-        self.assertIn("nozen.recoil.add(", cmd)
-        self.assertIn(name, cmd)
-        self.assertIn("{", cmd)
-        self.assertIn("}", cmd)
+    def test_recoil_add_worst_case_length(self):
+        """Test that the largest pattern the firmware stores overflows one line"""
+        # MAX_PATTERN_STEPS (recoil.rs) allows 64 values, i.e. 21 triplets;
+        # the firmware truncates the line, so the driver has to refuse it
+        with self.assertRaises(ValueError):
+            recoil_add_cmd("ak47", [-32768] * 63)
+        
+        # With worst-case values only 11 triplets fit the line buffer
+        self.assertLessEqual(len(recoil_add_cmd("ak47", [-32768] * 33)) - 1, LINE_MAX)
+        with self.assertRaises(ValueError):
+            recoil_add_cmd("ak47", [-32768] * 36)
         
     def test_recoil_delete_format(self):
         """Test recoil delete command format"""
-        name = "ak47"
-        cmd = f"nozen.recoil.delete({name})"
+        wire = _RECOIL_DELETE_FMT % b"ak47"
         
-        self.assertEqual(cmd, "nozen.recoil.delete(ak47)")
+        self.assertEqual(wire, b"nozen.recoil.delete(ak47)\n")
+        self.assertLessEqual(len(wire) - 1, LINE_MAX)
         
     def test_recoil_pattern_triplets(self):
         """Test that recoil patterns have triplets (x, y, delay)"""
         pattern = [10, -5, 100, 20, -10, 150]
         
-        # Should be divisible by 3
-        self.assertEqual(len(pattern) % 3, 0,
-                        "Pattern should be triplets of (x, y, delay)")
-        
-        # Extract triplets
-        triplets = [(pattern[i], pattern[i+1], pattern[i+2]) 
-                   for i in range(0, len(pattern), 3)]
+        # Pack once as little-endian i16 and extract triplets in C
+        triplets = list(struct.iter_unpack('<hhh', pack_pattern(pattern)))
         
         self.assertEqual(len(triplets), 2)
         self.assertEqual(triplets[0], (10, -5, 100))
         self.assertEqual(triplets[1], (20, -10, 150))
+        
+        with self.assertRaises(ValueError):
+            pack_pattern(pattern[:-1])
+        
+    def test_recoil_pattern_out_of_range(self):
+        """Test that pattern values must fit the firmware's i16 range"""
+        with self.assertRaises(struct.error):
+            pack_pattern([40000, 0, 10])
 
 
 class TestMouseStateTracking(unittest.TestCase):
@@ -317,20 +377,24 @@ class TestMouseStateTracking(unittest.TestCase):
         self.assertGreaterEqual(x, MIN_POS)
 
 
+_CASES = (
+    TestHIDDescriptorParsing,
+    TestCommandFormatting,
+    TestScancodeMapping,
+    TestModifierKeys,
+    TestRecoilPatternFormat,
+    TestMouseStateTracking,
+)
+
+
 def run_tests():
     """Run all unit tests"""
     loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-    
-    # Add all test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestHIDDescriptorParsing))
-    suite.addTests(loader.loadTestsFromTestCase(TestCommandFormatting))
-    suite.addTests(loader.loadTestsFromTestCase(TestScancodeMapping))
-    suite.addTests(loader.loadTestsFromTestCase(TestModifierKeys))
-    suite.addTests(loader.loadTestsFromTestCase(TestRecoilPatternFormat))
-    suite.addTests(loader.loadTestsFromTestCase(TestMouseStateTracking))
+    suite = unittest.TestSuite(loader.loadTestsFromTestCase(case) for case in _CASES)
     
-    runner = unittest.TextTestRunner(verbosity=2)
+    # Quiet by default; TEST_VERBOSITY=2 restores the per-test listing
+    runner = unittest.TextTestRunner(
+        verbosity=int(os.environ.get("TEST_VERBOSITY", "0")), buffer=True)
     result = runner.run(suite)
     
     return 0 if result.wasSuccessful() else 1
@@ -23,256 +23,508 @@ Examples:
     # Mouse wheel
     python3 test_injection.py --wheel 5
 
+    # Repeat an action within one connection
+    python3 test_injection.py --left-click --repeat 20 --interval 0.1
+
 Requirements:
     pip install pyserial
 """
 
-import serial
+import select
+import struct
 import time
 import argparse
+import logging
+import queue
+import re
 import sys
+import threading
+from array import array
 
-# HID Keyboard Scancodes (US layout)
-SCANCODES = {
-    'A': 0x04, 'B': 0x05, 'C': 0x06, 'D': 0x07, 'E': 0x08, 'F': 0x09,
-    'G': 0x0A, 'H': 0x0B, 'I': 0x0C, 'J': 0x0D, 'K': 0x0E, 'L': 0x0F,
-    'M': 0x10, 'N': 0x11, 'O': 0x12, 'P': 0x13, 'Q': 0x14, 'R': 0x15,
-    'S': 0x16, 'T': 0x17, 'U': 0x18, 'V': 0x19, 'W': 0x1A, 'X': 0x1B,
-    'Y': 0x1C, 'Z': 0x1D,
-    '1': 0x1E, '2': 0x1F, '3': 0x20, '4': 0x21, '5': 0x22,
-    '6': 0x23, '7': 0x24, '8': 0x25, '9': 0x26, '0': 0x27,
-    ' ': 0x2C, '\n': 0x28, '\t': 0x2B,
-}
+# HID Keyboard Scancodes (US layout), indexed by ord(ch); 0 means unmapped
+_scancodes = bytearray(128)
+for _ch, _sc in (
+    ('A', 0x04), ('B', 0x05), ('C', 0x06), ('D', 0x07), ('E', 0x08), ('F', 0x09),
+    ('G', 0x0A), ('H', 0x0B), ('I', 0x0C), ('J', 0x0D), ('K', 0x0E), ('L', 0x0F),
+    ('M', 0x10), ('N', 0x11), ('O', 0x12), ('P', 0x13), ('Q', 0x14), ('R', 0x15),
+    ('S', 0x16), ('T', 0x17), ('U', 0x18), ('V', 0x19), ('W', 0x1A), ('X', 0x1B),
+    ('Y', 0x1C), ('Z', 0x1D),
+    ('1', 0x1E), ('2', 0x1F), ('3', 0x20), ('4', 0x21), ('5', 0x22),
+    ('6', 0x23), ('7', 0x24), ('8', 0x25), ('9', 0x26), ('0', 0x27),
+    (' ', 0x2C), ('\n', 0x28), ('\t', 0x2B),
+):
+    _scancodes[ord(_ch)] = _sc
+SCANCODES = bytes(_scancodes)
 
 # Modifier keys
 MOD_LSHIFT = 0x02
 MOD_LCTRL = 0x01
 MOD_LALT = 0x04
 
+log = logging.getLogger("cynthion")
+
+# Command templates, formatted directly as bytes
+_MOVE_FMT = b"nozen.move(%d,%d)\n"
+_MOVETO_FMT = b"nozen.moveto(%d,%d)\n"
+_WHEEL_FMT = b"nozen.wheel(%d)\n"
+_RECOIL_ADD_FMT = b"nozen.recoil.add(%b){%b}\n"
+_RECOIL_DELETE_FMT = b"nozen.recoil.delete(%b)\n"
+_RECOIL_GET_FMT = b"nozen.recoil.get(%b)\n"
+_PRINT_FMT = b"nozen.print(%b)\n"
+
+# Commands that take no arguments
+_GETPOS_CMD = b"nozen.getpos()\n"
+_RECOIL_LIST_CMD = b"nozen.recoil.list\n"
+_RECOIL_NAMES_CMD = b"nozen.recoil.names\n"
+_RESTART_CMD = b"nozen.restart\n"
+
+
+class _IntBytes(dict):
+    """ASCII digits for small ints; anything outside the table is formatted on demand"""
+    def __missing__(self, value):
+        return b"%d" % value
+
+
+# Mouse deltas, wheel steps and most recoil values fit in a signed byte
+_int_bytes = _IntBytes((i, b"%d" % i) for i in range(-127, 128)).__getitem__
+
+# Mouse buttons; ASCII commands are indexed [button][state]
+BTN_LEFT, BTN_RIGHT, BTN_MIDDLE, BTN_SIDE1, BTN_SIDE2 = range(5)
+_BUTTON_CMDS = tuple((b"nozen.%b(0)\n" % n, b"nozen.%b(1)\n" % n)
+                     for n in (b"left", b"right", b"middle", b"side1", b"side2"))
+
+# Binary framing: opcode, payload length, payload. Only used when the
+# injector is created with binary=True and the firmware understands it.
+# Frames are delimited by the length byte, not a newline: x=10 packs to a
+# 0x0A byte, so they must never go through the firmware's line parser.
+OP_MOVE = 0x01
+OP_MOVETO = 0x02
+OP_WHEEL = 0x03
+OP_BTN = 0x04
+_XY_BIN = struct.Struct('<BBhh')
+_WHEEL_BIN = struct.Struct('<BBh')
+_BTN_BIN = struct.Struct('<BBBB')
+
+# Reply to nozen.getpos(): "km.pos(x,y)\n"
+_POS_RE = re.compile(rb'km\.pos\((-?\d+),(-?\d+)\)')
+
+
+def parse_pos(line):
+    """Parse a km.pos(x,y) reply into an (x, y) tuple, or None if it isn't one"""
+    m = _POS_RE.match(line)
+    if m is None:
+        return None
+    return int(m[1]), int(m[2])
+
+
+# Recoil pattern names: 1-32 (MAX_PATTERN_NAME_LEN) word characters
+_NAME_RE = re.compile(r'[A-Za-z0-9_]{1,32}\Z')
+is_valid_pattern_name = _NAME_RE.match
+
+
+def _pattern_name_bytes(name):
+    """Encode a recoil pattern name for the wire
+
+    Raises ValueError for names that could break out of the command, such
+    as ones containing ')' or a newline.
+    """
+    if not is_valid_pattern_name(name):
+        raise ValueError(f"invalid recoil pattern name {name!r}: "
+                         f"use 1-32 letters, digits or underscores")
+    return name.encode('ascii')
+
+
+def pack_pattern(pattern):
+    """Pack a flat x,y,delay,... recoil pattern into little-endian i16 triplets
+
+    Raises ValueError for incomplete triplets and struct.error for values
+    outside the firmware's i16 range.
+    """
+    if len(pattern) % 3:
+        raise ValueError("Pattern must be triplets of (x, y, delay)")
+    return struct.pack('<%dh' % len(pattern), *pattern)
+
+
+# CommandProcessor's line buffer; the firmware silently drops bytes past it
+LINE_MAX = 256
+
+
+def recoil_add_cmd(name, pattern):
+    """Build nozen.recoil.add(name){x,y,delay,...}
+
+    Raises ValueError for an invalid name, incomplete triplets or a line that
+    doesn't fit the firmware's line buffer, and struct.error for values
+    outside i16.
+    """
+    name = _pattern_name_bytes(name)
+    pack_pattern(pattern)
+    cmd = _RECOIL_ADD_FMT % (name, b",".join(map(_int_bytes, pattern)))
+    if len(cmd) - 1 > LINE_MAX:
+        raise ValueError(f"recoil.add line is {len(cmd) - 1} bytes, "
+                         f"over the firmware's {LINE_MAX}-byte line buffer")
+    return cmd
+
 class CynthionInjector:
-    def __init__(self, device='/dev/ttyACM0', baudrate=115200):
+    def __init__(self, device='/dev/ttyACM0', baudrate=115200, binary=False):
         """Initialize connection to Cynthion SAMD51"""
         self.device = device
         self.baudrate = baudrate
+        self.binary = binary
         self.ser = None
         self.mouse_x = 0
         self.mouse_y = 0
+        self._q = queue.SimpleQueue()
+        self._writer = None
+        self._write_error = None
         
     def connect(self):
         """Connect to device"""
+        # pyserial is imported here so --help and argument errors don't pay for it
+        try:
+            import serial
+        except ImportError:
+            print("[-] pyserial is required: pip install pyserial")
+            return False
         try:
             self.ser = serial.Serial(self.device, self.baudrate, timeout=0.1)
-            time.sleep(0.5)  # Wait for connection to stabilize
+            self._wait_ready()
+            self._start_writer()
             print(f"[+] Connected to {self.device} at {self.baudrate} baud")
             return True
         except serial.SerialException as e:
             print(f"[-] Failed to connect: {e}")
             return False
     
+    def _wait_ready(self, timeout=0.5):
+        """Probe with nozen.getpos() until the device answers or timeout expires"""
+        start = time.monotonic()
+        deadline = start + timeout
+        self.ser.reset_input_buffer()
+        while time.monotonic() < deadline:
+            self.ser.write(_GETPOS_CMD)
+            if self.ser.read_until(b"\n").endswith(b"\n"):
+                break
+        # Drop the probe replies so they don't show up as command responses
+        self.ser.reset_input_buffer()
+        log.debug("[*] Device ready after %.0f ms", (time.monotonic() - start) * 1000)
+    
+    def _start_writer(self):
+        """Start the thread that writes queued commands to self.ser"""
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+    
     def disconnect(self):
         """Disconnect from device"""
         if self.ser:
+            if self._writer:
+                self._q.put(None)
+                self._writer.join()
+                self._writer = None
             self.ser.close()
             print("[+] Disconnected")
     
+    def _send(self, cmd, expect_reply=False):
+        """Queue one command; wait for it to be written if a reply is expected
+
+        Commands are never joined into one write: the firmware parses only
+        the first line of each USB read and drops the rest.
+        """
+        self._raise_write_error()
+        self._q.put(cmd)
+        if log.isEnabledFor(logging.DEBUG):
+            if cmd[0] < 0x20:
+                log.debug("[>] %s", cmd.hex(' '))
+            else:
+                log.debug("[>] %s", cmd[:-1].decode('ascii'))
+        if expect_reply:
+            self.flush()
+    
+    def flush(self):
+        """Block until every queued command has been written to the port
+
+        A long queue can take seconds to drain at the firmware's pace, so
+        this only fails on a write error or a writer that has stopped.
+        """
+        done = threading.Event()
+        self._q.put(done)
+        while not done.wait(0.1):
+            if self._writer is None or not self._writer.is_alive():
+                raise RuntimeError("writer thread is not running")
+        self._raise_write_error()
+    
+    def _raise_write_error(self):
+        """Re-raise a write failure from the writer thread on the caller's thread"""
+        if self._write_error is not None:
+            raise self._write_error
+    
+    def _writer_loop(self):
+        """Write queued commands to the port off the calling thread, one per write"""
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif self._write_error is None:
+                try:
+                    self.ser.write(item)
+                except Exception as e:
+                    # Keep draining so flush() waiters wake; commands queued
+                    # after a failed write are dropped
+                    self._write_error = e
+    
     def move(self, x, y):
         """Move mouse relative - nozen.move(x,y)"""
-        cmd = f"nozen.move({x},{y})\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        if self.binary:
+            self._send(_XY_BIN.pack(OP_MOVE, 4, x, y))
+        else:
+            self._send(_MOVE_FMT % (x, y))
         self.mouse_x += x
         self.mouse_y += y
-        time.sleep(0.01)
     
     def moveto(self, x, y):
         """Move mouse absolute - nozen.moveto(x,y)"""
-        cmd = f"nozen.moveto({x},{y})\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        if self.binary:
+            self._send(_XY_BIN.pack(OP_MOVETO, 4, x, y))
+        else:
+            self._send(_MOVETO_FMT % (x, y))
         self.mouse_x = x
         self.mouse_y = y
-        time.sleep(0.01)
     
     def get_pos(self):
         """Get mouse position - nozen.getpos()"""
-        cmd = "nozen.getpos()\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        self._send(_GETPOS_CMD, expect_reply=True)
         time.sleep(0.05)
         if self.ser.in_waiting:
-            response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+            line = self.ser.readline()
+            pos = parse_pos(line)
+            if pos is not None:
+                self.mouse_x, self.mouse_y = pos
+            response = line.decode('ascii', errors='ignore').strip()
+            log.info("[<] %s", response)
             return response
     
+    def _button(self, button, state):
+        """Queue a button press (1) or release (0)"""
+        if self.binary:
+            self._send(_BTN_BIN.pack(OP_BTN, 2, button, state))
+        else:
+            self._send(_BUTTON_CMDS[button][state])
+    
     def left_press(self):
         """Press left button - nozen.left(1)"""
-        self.ser.write(b"nozen.left(1)\n")
-        print("[>] nozen.left(1)")
-        time.sleep(0.01)
+        self._button(BTN_LEFT, 1)
     
     def left_release(self):
         """Release left button - nozen.left(0)"""
-        self.ser.write(b"nozen.left(0)\n")
-        print("[>] nozen.left(0)")
-        time.sleep(0.01)
+        self._button(BTN_LEFT, 0)
     
     def right_press(self):
         """Press right button - nozen.right(1)"""
-        self.ser.write(b"nozen.right(1)\n")
-        print("[>] nozen.right(1)")
-        time.sleep(0.01)
+        self._button(BTN_RIGHT, 1)
     
     def right_release(self):
         """Release right button - nozen.right(0)"""
-        self.ser.write(b"nozen.right(0)\n")
-        print("[>] nozen.right(0)")
-        time.sleep(0.01)
+        self._button(BTN_RIGHT, 0)
     
     def middle_press(self):
         """Press middle button - nozen.middle(1)"""
-        self.ser.write(b"nozen.middle(1)\n")
-        print("[>] nozen.middle(1)")
-        time.sleep(0.01)
+        self._button(BTN_MIDDLE, 1)
     
     def middle_release(self):
         """Release middle button - nozen.middle(0)"""
-        self.ser.write(b"nozen.middle(0)\n")
-        print("[>] nozen.middle(0)")
-        time.sleep(0.01)
+        self._button(BTN_MIDDLE, 0)
     
     def side1_press(self):
         """Press forward side button - nozen.side1(1)"""
-        self.ser.write(b"nozen.side1(1)\n")
-        print("[>] nozen.side1(1)")
-        time.sleep(0.01)
+        self._button(BTN_SIDE1, 1)
     
     def side1_release(self):
         """Release forward side button - nozen.side1(0)"""
-        self.ser.write(b"nozen.side1(0)\n")
-        print("[>] nozen.side1(0)")
-        time.sleep(0.01)
+        self._button(BTN_SIDE1, 0)
     
     def side2_press(self):
         """Press back side button - nozen.side2(1)"""
-        self.ser.write(b"nozen.side2(1)\n")
-        print("[>] nozen.side2(1)")
-        time.sleep(0.01)
+        self._button(BTN_SIDE2, 1)
     
     def side2_release(self):
         """Release back side button - nozen.side2(0)"""
-        self.ser.write(b"nozen.side2(0)\n")
-        print("[>] nozen.side2(0)")
-        time.sleep(0.01)
+        self._button(BTN_SIDE2, 0)
     
     def wheel(self, movement):
         """Mouse wheel - nozen.wheel(movement)"""
-        cmd = f"nozen.wheel({movement})\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
-        time.sleep(0.01)
+        if self.binary:
+            self._send(_WHEEL_BIN.pack(OP_WHEEL, 2, movement))
+        else:
+            self._send(_WHEEL_FMT % movement)
     
     def left_click(self):
         """Click left button (press + release)"""
         self.left_press()
+        self.flush()
         time.sleep(0.05)
         self.left_release()
     
     def right_click(self):
         """Click right button (press + release)"""
         self.right_press()
+        self.flush()
         time.sleep(0.05)
         self.right_release()
     
     def middle_click(self):
         """Click middle button (press + release)"""
         self.middle_press()
+        self.flush()
         time.sleep(0.05)
         self.middle_release()
     
     def recoil_add(self, name, pattern):
         """Add recoil pattern - nozen.recoil.add(name){x,y,delay,...}"""
-        pattern_str = ','.join(map(str, pattern))
-        cmd = f"nozen.recoil.add({name}){{{pattern_str}}}\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        self._send(recoil_add_cmd(name, pattern), expect_reply=True)
         time.sleep(0.05)
         if self.ser.in_waiting:
             response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+            log.info("[<] %s", response)
+    
+    def _render_recoil(self, pattern):
+        """Render a pattern into (commands, delay_s) bursts
+
+        Moves are grouped until a step with a non-zero delay, so each burst
+        is queued back to back; every move is still its own write.
+        """
+        bursts = []
+        staged = []
+        for x, y, delay in struct.iter_unpack('<hhh', pack_pattern(pattern)):
+            if self.binary:
+                staged.append(_XY_BIN.pack(OP_MOVE, 4, x, y))
+            else:
+                staged.append(_MOVE_FMT % (x, y))
+            if delay > 0:
+                bursts.append((tuple(staged), delay / 1000))
+                staged.clear()
+        if staged:
+            bursts.append((tuple(staged), 0.0))
+        return bursts
+    
+    def play_recoil(self, pattern, iterations=1):
+        """Replay an x,y,delay pattern from the host as relative moves"""
+        bursts = self._render_recoil(pattern)
+        log.debug("[>] replaying %d steps x%d in %d bursts",
+                  len(pattern) // 3, iterations, len(bursts))
+        send = self._send
+        for _ in range(iterations):
+            for commands, delay in bursts:
+                for cmd in commands:
+                    send(cmd)
+                if delay:
+                    time.sleep(delay)
+        self.mouse_x += sum(pattern[0::3]) * iterations
+        self.mouse_y += sum(pattern[1::3]) * iterations
     
     def recoil_delete(self, name):
         """Delete recoil pattern - nozen.recoil.delete(name)"""
-        cmd = f"nozen.recoil.delete({name})\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        self._send(_RECOIL_DELETE_FMT % _pattern_name_bytes(name), expect_reply=True)
         time.sleep(0.05)
         if self.ser.in_waiting:
             response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+            log.info("[<] %s", response)
     
     def recoil_list(self):
         """List all recoil patterns - nozen.recoil.list"""
-        cmd = "nozen.recoil.list\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
-        time.sleep(0.05)
-        while self.ser.in_waiting:
-            response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+        self._send(_RECOIL_LIST_CMD, expect_reply=True)
+        self._log_reply_lines()
+    
+    def _log_reply_lines(self):
+        """Log reply lines until the port stays idle for one read timeout"""
+        while True:
+            line = self.ser.read_until(b"\n")
+            if not line:
+                break
+            response = line.decode('ascii', errors='ignore').strip()
+            if not line.endswith(b"\n"):
+                # Timed out mid-line: the device stopped sending
+                log.info("[<] %s (truncated)", response)
+                break
+            log.info("[<] %s", response)
     
     def recoil_get(self, name):
         """Get specific recoil pattern - nozen.recoil.get(name)"""
-        cmd = f"nozen.recoil.get({name})\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        self._send(_RECOIL_GET_FMT % _pattern_name_bytes(name), expect_reply=True)
         time.sleep(0.05)
         if self.ser.in_waiting:
             response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+            log.info("[<] %s", response)
     
     def recoil_names(self):
         """List recoil pattern names - nozen.recoil.names"""
-        cmd = "nozen.recoil.names\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
-        time.sleep(0.05)
-        while self.ser.in_waiting:
-            response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+        self._send(_RECOIL_NAMES_CMD, expect_reply=True)
+        self._log_reply_lines()
     
     def print_message(self, message):
         """Print message - nozen.print(message)"""
-        cmd = f"nozen.print({message})\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        self._send(_PRINT_FMT % message.encode('ascii'), expect_reply=True)
         time.sleep(0.05)
         if self.ser.in_waiting:
             response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+            log.info("[<] %s", response)
     
     def restart(self):
         """Restart device - nozen.restart"""
-        cmd = "nozen.restart\n"
-        self.ser.write(cmd.encode('ascii'))
-        print(f"[>] {cmd.strip()}")
+        self._send(_RESTART_CMD, expect_reply=True)
         time.sleep(0.5)
         if self.ser.in_waiting:
             response = self.ser.readline().decode('ascii', errors='ignore').strip()
-            print(f"[<] {response}")
+            log.info("[<] %s", response)
     
     def monitor_status(self):
         """Monitor status messages from FPGA"""
         print("[*] Monitoring FPGA status (Ctrl+C to stop)...")
+        pending = bytearray()
         try:
             while True:
-                if self.ser.in_waiting:
-                    line = self.ser.readline().decode('ascii', errors='ignore').strip()
+                readable, _, _ = select.select([self.ser.fileno()], [], [], 0.1)
+                if not readable:
+                    continue
+                pending += self.ser.read(self.ser.in_waiting or 1)
+                # Only decode complete lines; keep the tail for the next read
+                *lines, tail = pending.split(b'\n')
+                pending = bytearray(tail)
+                for line in lines:
+                    line = line.decode('ascii', errors='ignore').strip()
                     if line:
-                        print(f"[<] {line}")
-                time.sleep(0.1)
+                        log.info("[<] %s", line)
         except KeyboardInterrupt:
             print("\n[*] Stopped monitoring")
 
+# (argparse dest, handler) in execution order; --monitor runs last, outside the table
+_ACTIONS = (
+    ('move', lambda inj, v: inj.move(*v)),
+    ('moveto', lambda inj, v: inj.moveto(*v)),
+    ('getpos', lambda inj, _: inj.get_pos()),
+    ('left_press', lambda inj, _: inj.left_press()),
+    ('left_release', lambda inj, _: inj.left_release()),
+    ('left_click', lambda inj, _: inj.left_click()),
+    ('right_press', lambda inj, _: inj.right_press()),
+    ('right_release', lambda inj, _: inj.right_release()),
+    ('right_click', lambda inj, _: inj.right_click()),
+    ('middle_press', lambda inj, _: inj.middle_press()),
+    ('middle_release', lambda inj, _: inj.middle_release()),
+    ('middle_click', lambda inj, _: inj.middle_click()),
+    ('side1_press', lambda inj, _: inj.side1_press()),
+    ('side1_release', lambda inj, _: inj.side1_release()),
+    ('side2_press', lambda inj, _: inj.side2_press()),
+    ('side2_release', lambda inj, _: inj.side2_release()),
+    ('wheel', lambda inj, v: inj.wheel(v)),
+    ('recoil_add', lambda inj, v: inj.recoil_add(*v)),
+    ('recoil_delete', lambda inj, v: inj.recoil_delete(v)),
+    ('recoil_list', lambda inj, _: inj.recoil_list()),
+    ('recoil_get', lambda inj, v: inj.recoil_get(v)),
+    ('recoil_names', lambda inj, _: inj.recoil_names()),
+    ('print', lambda inj, v: inj.print_message(v)),
+    ('restart', lambda inj, _: inj.restart()),
+)
+
 def main():
     parser = argparse.ArgumentParser(description='Cynthion HID Injection Tool (nozen command format)')
     parser.add_argument('--device', default='/dev/ttyACM0', help='Serial device (default: /dev/ttyACM0)')
@@ -315,8 +567,67 @@ def main():
     # Monitor
     parser.add_argument('--monitor', action='store_true', help='Monitor FPGA status messages')
     
+    parser.add_argument('-v', '--verbose', action='store_true', help='Echo every command sent to the device')
+    
+    # Repetition
+    parser.add_argument('--repeat', type=int, default=1, metavar='N', help='Run the selected actions N times (default: 1)')
+    parser.add_argument('--interval', type=float, default=0.0, metavar='SECONDS', help='Delay between repetitions (default: 0)')
+    
     args = parser.parse_args()
     
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(message)s', stream=sys.stdout)
+    
+    # Names are spliced into the command line, so check them before connecting
+    names = [args.recoil_add[0]] if args.recoil_add else []
+    names += [name for name in (args.recoil_delete, args.recoil_get) if name is not None]
+    for name in names:
+        try:
+            _pattern_name_bytes(name)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    # Parse pattern string once: "x,y,delay,x,y,delay,..." into packed i16
+    if args.recoil_add:
+        name, pattern_str = args.recoil_add
+        try:
+            pattern = array('h', map(int, pattern_str.split(',')))
+        except (ValueError, OverflowError) as e:
+            parser.error(f"invalid recoil pattern: {e}")
+        if len(pattern) % 3:
+            parser.error(f"invalid recoil pattern: {len(pattern)} values is not "
+                         f"a whole number of x,y,delay triplets")
+        try:
+            recoil_add_cmd(name, pattern)
+        except ValueError as e:
+            parser.error(f"invalid recoil pattern: {e}")
+        args.recoil_add = (name, pattern)
+    
+    # Unset flags are None or False; a --wheel of 0 is still an action
+    selected = [(handler, value) for name, handler in _ACTIONS
+                for value in (getattr(args, name),)
+                if value is not None and value is not False]
+    
+    # If no actions specified, show help
+    has_action = bool(selected) or args.monitor
+    
+    if not has_action:
+        parser.print_help()
+        print("\nExample commands (nozen format):")
+        print("  python3 test_injection.py --move 10 -5")
+        print("  python3 test_injection.py --moveto 100 200")
+        print("  python3 test_injection.py --getpos")
+        print("  python3 test_injection.py --left-click")
+        print("  python3 test_injection.py --left-click --repeat 20 --interval 0.1")
+        print("  python3 test_injection.py --right-press")
+        print("  python3 test_injection.py --wheel 5")
+        print("  python3 test_injection.py --recoil-add ak47 '2,-3,50,1,-2,50,0,-1,50'")
+        print("  python3 test_injection.py --recoil-list")
+        print("  python3 test_injection.py --recoil-names")
+        print("  python3 test_injection.py --print 'Hello World'")
+        print("  python3 test_injection.py --monitor")
+        return
+    
     # Create injector
     injector = CynthionInjector(args.device, args.baud)
     
@@ -324,116 +635,25 @@ def main():
         sys.exit(1)
     
     try:
-        # Execute actions
-        if args.move:
-            x, y = args.move
-            injector.move(x, y)
-        
-        if args.moveto:
-            x, y = args.moveto
-            injector.moveto(x, y)
-        
-        if args.getpos:
-            injector.get_pos()
-        
-        if args.left_press:
-            injector.left_press()
-        
-        if args.left_release:
-            injector.left_release()
+        # One connection for all repetitions; an interval waits for each
+        # repetition to be written before sleeping
+        for _ in range(args.repeat):
+            for handler, value in selected:
+                handler(injector, value)
+            
+            if args.interval:
+                injector.flush()
+                time.sleep(args.interval)
         
-        if args.left_click:
-            injector.left_click()
-        
-        if args.right_press:
-            injector.right_press()
-        
-        if args.right_release:
-            injector.right_release()
-        
-        if args.right_click:
-            injector.right_click()
-        
-        if args.middle_press:
-            injector.middle_press()
-        
-        if args.middle_release:
-            injector.middle_release()
-        
-        if args.middle_click:
-            injector.middle_click()
-        
-        if args.side1_press:
-        if args.wheel is not None:
-            injector.wheel(args.wheel)
-        
-        if args.recoil_add:
-            name, pattern_str = args.recoil_add
-            # Parse pattern string: "x,y,delay,x,y,delay,..."
-            pattern = [int(x.strip()) for x in pattern_str.split(',')]
-            injector.recoil_add(name, pattern)
-        
-        if args.recoil_delete:
-            injector.recoil_delete(args.recoil_delete)
-        
-        if args.recoil_list:
-            injector.recoil_list()
-        
-        if args.recoil_get:
-            injector.recoil_get(args.recoil_get)
-        
-        if args.recoil_names:
-            injector.recoil_names()
-        
-        if args.print:
-            injector.print_message(args.print)
-        
-        if args.restart:
-            injector.restart()
+        # Surface a failed write before disconnecting
+        injector.flush()
         
         if args.monitor:
-        if not has_action:
-            parser.print_help()
-            print("\nExample commands (nozen format):")
-            print("  python3 test_injection.py --move 10 -5")
-            print("  python3 test_injection.py --moveto 100 200")
-            print("  python3 test_injection.py --getpos")
-            print("  python3 test_injection.py --left-click")
-            print("  python3 test_injection.py --right-press")
-            print("  python3 test_injection.py --wheel 5")
-            print("  python3 test_injection.py --recoil-add ak47 '2,-3,50,1,-2,50,0,-1,50'")
-            print("  python3 test_injection.py --recoil-list")
-            print("  python3 test_injection.py --recoil-names")
-            print("  python3 test_injection.py --print 'Hello World'")
-            print("  python3 test_injection.py --monitor")
-            args.wheel is not None, args.monitor,
-            args.recoil_add, args.recoil_delete, args.recoil_list,
-            args.recoil_get, args.recoil_names,
-            args.print, args.restart
-        ])  injector.monitor_status()
-        
-        # If no actions specified, show help
-        has_action = any([
-            args.move, args.moveto, args.getpos,
-            args.left_press, args.left_release, args.left_click,
-            args.right_press, args.right_release, args.right_click,
-            args.middle_press, args.middle_release, args.middle_click,
-            args.side1_press, args.side1_release,
-            args.side2_press, args.side2_release,
-            args.wheel is not None, args.monitor
-        ])
-        
-        if not has_action:
-            parser.print_help()
-            print("\nExample commands (nozen format):")
-            print("  python3 test_injection.py --move 10 -5")
-            print("  python3 test_injection.py --moveto 100 200")
-            print("  python3 test_injection.py --getpos")
-            print("  python3 test_injection.py --left-click")
-            print("  python3 test_injection.py --right-press")
-            print("  python3 test_injection.py --wheel 5")
-            print("  python3 test_injection.py --monitor")
+            injector.monitor_status()
     
+    except OSError as e:
+        print(f"[-] Write failed: {e}")
+        sys.exit(1)
     finally:
         injector.disconnect()
 
@@ -4,8 +4,114 @@ Unit tests for HID injection functionality
 Tests command generation without requiring hardware
 """
 
+import os
+import struct
 import unittest
 import sys
+from array import array
+
+from test_injection import (
+    BTN_LEFT, BTN_MIDDLE, BTN_RIGHT, BTN_SIDE1, BTN_SIDE2, LINE_MAX, OP_MOVE, SCANCODES,
+    _BUTTON_CMDS, _GETPOS_CMD, _MOVE_FMT, _MOVETO_FMT, _RECOIL_DELETE_FMT,
+    _RECOIL_GET_FMT, _RECOIL_LIST_CMD, _RECOIL_NAMES_CMD, _RESTART_CMD,
+    _WHEEL_FMT, _XY_BIN, _int_bytes,
+    CynthionInjector, is_valid_pattern_name, pack_pattern, parse_pos, recoil_add_cmd,
+)
+
+
+# Command builders over the driver's own templates
+def move_cmd(x, y):
+    return _MOVE_FMT % (x, y)
+
+
+def moveto_cmd(x, y):
+    return _MOVETO_FMT % (x, y)
+
+
+def wheel_cmd(amount):
+    return _WHEEL_FMT % amount
+
+
+class _FirmwareParser:
+    """Model of CommandProcessor::parse() in protocol.rs
+
+    Each USB read yields at most one line: parsing returns at the first
+    newline and the rest of that read is dropped. Line bytes past the
+    256-byte buffer are discarded.
+    """
+    
+    def __init__(self):
+        self.buffer = bytearray()
+    
+    def feed(self, data):
+        for byte in data:
+            if byte in b"\r\n":
+                line = bytes(self.buffer)
+                self.buffer.clear()
+                return line
+            if len(self.buffer) < 256:
+                self.buffer.append(byte)
+        return None
+
+
+def parse_writes(writes):
+    """Feed each write to the firmware model as one USB read; return the parsed lines"""
+    parser = _FirmwareParser()
+    return [line for line in map(parser.feed, writes) if line is not None]
+
+
+class _FakePort:
+    """Serial stand-in that records every write()"""
+    
+    def __init__(self):
+        self.writes = []
+    
+    def write(self, data):
+        self.writes.append(bytes(data))
+        return len(data)
+
+
+class _FailingPort(_FakePort):
+    """Serial stand-in whose writes fail as if the device was unplugged"""
+    
+    def write(self, data):
+        raise OSError("device disconnected")
+
+
+# Keyboard fixtures shared by every test
+MOD_LSHIFT = 0x02
+MOD_LCTRL = 0x01
+MOD_LALT = 0x04
+
+# Validation fixtures
+_VALID_BUTTON_STATES = frozenset((0, 1))
+_VALID_REL_COORDS = (0, 50, -50, -127, 127)
+_VALID_ABS_COORDS = (0, 1000, -1000, -32768, 32767)
+_VALID_WHEEL_AMOUNTS = (0, 1, -1, 5, -5, -127, 127)
+
+# Expected press/release bytes for every (button, state) the firmware accepts
+_EXPECTED_BUTTON_CMDS = {
+    (BTN_LEFT, 1): b"nozen.left(1)\n", (BTN_LEFT, 0): b"nozen.left(0)\n",
+    (BTN_RIGHT, 1): b"nozen.right(1)\n", (BTN_RIGHT, 0): b"nozen.right(0)\n",
+    (BTN_MIDDLE, 1): b"nozen.middle(1)\n", (BTN_MIDDLE, 0): b"nozen.middle(0)\n",
+    (BTN_SIDE1, 1): b"nozen.side1(1)\n", (BTN_SIDE1, 0): b"nozen.side1(0)\n",
+    (BTN_SIDE2, 1): b"nozen.side2(1)\n", (BTN_SIDE2, 0): b"nozen.side2(0)\n",
+}
+_LEFT_DOWN = _BUTTON_CMDS[BTN_LEFT][1]
+_LEFT_UP = _BUTTON_CMDS[BTN_LEFT][0]
+
+# Argument-less commands: (name, driver bytes, expected wire bytes)
+_LITERAL_CMDS = (
+    ("getpos", _GETPOS_CMD, b"nozen.getpos()\n"),
+    ("restart", _RESTART_CMD, b"nozen.restart\n"),
+    ("recoil_list", _RECOIL_LIST_CMD, b"nozen.recoil.list\n"),
+    ("recoil_names", _RECOIL_NAMES_CMD, b"nozen.recoil.names\n"),
+)
+
+# Recoil pattern fixtures: x,y,delay triplets
+_VALID_PATTERN = (10, -5, 100, 20, -10, 150)
+_INVALID_PATTERN = (10, -5, 100, 20)  # Not divisible by 3
+_MAX_PATTERN = (1, 2, 3) * 21  # 63 values = 21 triplets, the most under MAX_STEPS
 
 
 class TestMouseCommands(unittest.TestCase):
@@ -14,92 +120,48 @@ class TestMouseCommands(unittest.TestCase):
     def test_move_command_basic(self):
         """Test basic move command"""
         x, y = 10, -5
-        cmd = f"nozen.move({x},{y})\n"
+        cmd = move_cmd(x, y)
         
-        self.assertTrue(cmd.startswith("nozen.move("))
-        self.assertTrue(cmd.endswith(")\n"))
-        self.assertIn("10", cmd)
-        self.assertIn("-5", cmd)
+        self.assertEqual(cmd, b"nozen.move(10,-5)\n")
         
     def test_move_command_large_values(self):
         """Test move with large coordinate values"""
         x, y = 127, -127
-        cmd = f"nozen.move({x},{y})\n"
+        cmd = move_cmd(x, y)
         
-        self.assertIn("127", cmd)
-        self.assertIn("-127", cmd)
+        self.assertEqual(cmd, b"nozen.move(127,-127)\n")
         
     def test_moveto_command(self):
         """Test absolute positioning command"""
         x, y = 100, 200
-        cmd = f"nozen.moveto({x},{y})\n"
+        cmd = moveto_cmd(x, y)
         
-        self.assertEqual(cmd, "nozen.moveto(100,200)\n")
+        self.assertEqual(cmd, b"nozen.moveto(100,200)\n")
         
-    def test_left_click_commands(self):
-        """Test left mouse button commands"""
-        press = "nozen.left(1)\n"
-        release = "nozen.left(0)\n"
-        
-        self.assertEqual(press, "nozen.left(1)\n")
-        self.assertEqual(release, "nozen.left(0)\n")
-        
-    def test_right_click_commands(self):
-        """Test right mouse button commands"""
-        press = "nozen.right(1)\n"
-        release = "nozen.right(0)\n"
-        
-        self.assertEqual(press, "nozen.right(1)\n")
-        self.assertEqual(release, "nozen.right(0)\n")
-        
-    def test_middle_click_commands(self):
-        """Test middle mouse button commands"""
-        press = "nozen.middle(1)\n"
-        release = "nozen.middle(0)\n"
-        
-        self.assertEqual(press, "nozen.middle(1)\n")
-        self.assertEqual(release, "nozen.middle(0)\n")
-        
-    def test_side_button_commands(self):
-        """Test side button commands"""
-        side1_press = "nozen.side1(1)\n"
-        side2_press = "nozen.side2(1)\n"
-        
-        self.assertEqual(side1_press, "nozen.side1(1)\n")
-        self.assertEqual(side2_press, "nozen.side2(1)\n")
+    def test_button_commands(self):
+        """Test press/release commands for every mouse button"""
+        for (button, state), expected in _EXPECTED_BUTTON_CMDS.items():
+            with self.subTest(button=button, state=state):
+                self.assertEqual(_BUTTON_CMDS[button][state], expected)
         
     def test_wheel_scroll(self):
         """Test mouse wheel scrolling"""
-        scroll_up = "nozen.wheel(5)\n"
-        scroll_down = "nozen.wheel(-3)\n"
-        
-        self.assertEqual(scroll_up, "nozen.wheel(5)\n")
-        self.assertEqual(scroll_down, "nozen.wheel(-3)\n")
+        self.assertEqual(wheel_cmd(5), b"nozen.wheel(5)\n")
+        self.assertEqual(wheel_cmd(-3), b"nozen.wheel(-3)\n")
 
 
 class TestKeyboardCommands(unittest.TestCase):
     """Test keyboard command generation"""
     
-    def setUp(self):
-        """Set up scancode mappings"""
-        self.SCANCODES = {
-            'A': 0x04, 'B': 0x05, 'C': 0x06, 'D': 0x07,
-            'ENTER': 0x28, 'SPACE': 0x2C, 'TAB': 0x2B,
-        }
-        
-        self.MOD_LSHIFT = 0x02
-        self.MOD_LCTRL = 0x01
-        self.MOD_LALT = 0x04
-        
     def test_single_key_press(self):
         """Test single key press command"""
-        scancode = self.SCANCODES['A']
+        scancode = SCANCODES[ord('A')]
         self.assertEqual(scancode, 0x04)
         
     def test_key_with_modifier(self):
         """Test key press with modifier"""
-        scancode = self.SCANCODES['C']
-        modifiers = self.MOD_LCTRL
+        scancode = SCANCODES[ord('C')]
+        modifiers = MOD_LCTRL
         
         # Ctrl+C
         self.assertEqual(modifiers, 0x01)
@@ -107,8 +169,8 @@ class TestKeyboardCommands(unittest.TestCase):
         
     def test_multiple_modifiers(self):
         """Test combining multiple modifiers"""
-        scancode = self.SCANCODES['A']
-        modifiers = self.MOD_LSHIFT | self.MOD_LCTRL
+        scancode = SCANCODES[ord('A')]
+        modifiers = MOD_LSHIFT | MOD_LCTRL
         
         # Ctrl+Shift+A
         self.assertEqual(modifiers, 0x03)
@@ -116,9 +178,9 @@ class TestKeyboardCommands(unittest.TestCase):
         
     def test_special_keys(self):
         """Test special key scancodes"""
-        self.assertEqual(self.SCANCODES['ENTER'], 0x28)
-        self.assertEqual(self.SCANCODES['SPACE'], 0x2C)
-        self.assertEqual(self.SCANCODES['TAB'], 0x2B)
+        self.assertEqual(SCANCODES[ord('\n')], 0x28)
+        self.assertEqual(SCANCODES[ord(' ')], 0x2C)
+        self.assertEqual(SCANCODES[ord('\t')], 0x2B)
 
 
 class TestRecoilCommands(unittest.TestCase):
@@ -129,11 +191,10 @@ class TestRecoilCommands(unittest.TestCase):
         name = "test_pattern"
         pattern = [10, -5, 100]
         
-        pattern_str = ",".join(map(str, pattern))
-        cmd = f"nozen.recoil.add({name}){{{pattern_str}}}\n"
+        cmd = recoil_add_cmd(name, pattern)
         
-        self.assertIn(name, cmd)
-        self.assertIn("10,-5,100", cmd)
+        self.assertIn(b"(test_pattern)", cmd)
+        self.assertIn(b"{10,-5,100}", cmd)
         
     def test_recoil_add_complex(self):
         """Test adding a complex recoil pattern"""
@@ -148,36 +209,56 @@ class TestRecoilCommands(unittest.TestCase):
         # Verify pattern is triplets
         self.assertEqual(len(pattern) % 3, 0)
         
-        pattern_str = ",".join(map(str, pattern))
-        cmd = f"nozen.recoil.add({name}){{{pattern_str}}}\n"
+        cmd = recoil_add_cmd(name, pattern)
         
-        self.assertIn("ak47", cmd)
-        self.assertIn("{", cmd)
-        self.assertIn("}", cmd)
+        self.assertTrue(cmd.startswith(b"nozen.recoil.add(ak47){"))
+        self.assertTrue(cmd.endswith(b"}\n"))
         
-    def test_recoil_delete(self):
-        """Test deleting a recoil pattern"""
-        name = "test_pattern"
-        cmd = f"nozen.recoil.delete({name})\n"
+    def test_recoil_add_matches_fstring(self):
+        """Test that the single-join builder matches the two-step f-string build"""
+        for pattern in ([10, -5, 100], [-32768, 32767, 1] * 11, [-128, 127, 128], []):
+            with self.subTest(steps=len(pattern)):
+                pattern_str = ",".join(map(str, pattern))
+                expected = f"nozen.recoil.add(ak47){{{pattern_str}}}\n".encode('ascii')
+                self.assertEqual(recoil_add_cmd("ak47", pattern), expected)
+        
+    def test_int_bytes_outside_table(self):
+        """Test that values past the pre-rendered range are formatted on demand"""
+        for value in (0, -127, 127, -128, 128, -32768, 32767):
+            with self.subTest(value=value):
+                self.assertEqual(_int_bytes(value), str(value).encode('ascii'))
         
-        self.assertEqual(cmd, "nozen.recoil.delete(test_pattern)\n")
+    def test_xy_frame_length_delimited(self):
+        """Test that binary move frames are delimited by their length byte"""
+        frame = _XY_BIN.pack(OP_MOVE, 4, 10, 13)
         
-    def test_recoil_list(self):
-        """Test listing recoil patterns"""
-        cmd = "nozen.recoil.list\n"
-        self.assertEqual(cmd, "nozen.recoil.list\n")
+        self.assertIn(b"\n", frame)
+        self.assertIn(b"\r", frame)
+        self.assertEqual(len(frame), 2 + frame[1])
+        self.assertEqual(struct.unpack('<hh', frame[2:2 + frame[1]]), (10, 13))
         
-    def test_recoil_names(self):
-        """Test getting pattern names"""
-        cmd = "nozen.recoil.names\n"
-        self.assertEqual(cmd, "nozen.recoil.names\n")
+    def test_recoil_add_line_budget(self):
+        """Test that the driver refuses recoil lines the firmware would truncate"""
+        with self.assertRaises(ValueError):
+            recoil_add_cmd("ak47", [-32768] * 63)
+        
+        cmd = recoil_add_cmd("ak47", [-32768] * 33)
+        self.assertLessEqual(len(cmd) - 1, LINE_MAX)
+        self.assertEqual(_FirmwareParser().feed(cmd), cmd[:-1])
+        
+    def test_recoil_delete(self):
+        """Test deleting a recoil pattern"""
+        name = b"test_pattern"
+        cmd = _RECOIL_DELETE_FMT % name
+        
+        self.assertEqual(cmd, b"nozen.recoil.delete(test_pattern)\n")
         
     def test_recoil_get(self):
         """Test getting a specific pattern"""
-        name = "ak47"
-        cmd = f"nozen.recoil.get({name})\n"
+        name = b"ak47"
+        cmd = _RECOIL_GET_FMT % name
         
-        self.assertEqual(cmd, "nozen.recoil.get(ak47)\n")
+        self.assertEqual(cmd, b"nozen.recoil.get(ak47)\n")
 
 
 class TestCommandSequences(unittest.TestCase):
@@ -186,34 +267,32 @@ class TestCommandSequences(unittest.TestCase):
     def test_click_sequence(self):
         """Test a complete click sequence"""
         sequence = [
-            "nozen.left(1)\n",  # Press
-            "nozen.left(0)\n",  # Release
+            _LEFT_DOWN,  # Press
+            _LEFT_UP,    # Release
         ]
         
-        self.assertEqual(len(sequence), 2)
-        self.assertTrue(all(cmd.startswith("nozen.") for cmd in sequence))
+        self.assertEqual(parse_writes(sequence), [b"nozen.left(1)", b"nozen.left(0)"])
         
     def test_drag_sequence(self):
         """Test a mouse drag sequence"""
         sequence = [
-            "nozen.left(1)\n",      # Press button
-            "nozen.move(10,0)\n",   # Move right
-            "nozen.move(10,0)\n",   # Move right more
-            "nozen.left(0)\n",      # Release button
+            _LEFT_DOWN,        # Press button
+            move_cmd(10, 0),   # Move right
+            move_cmd(10, 0),   # Move right more
+            _LEFT_UP,          # Release button
         ]
         
-        self.assertEqual(len(sequence), 4)
+        lines = parse_writes(sequence)
+        
+        self.assertEqual(lines, [b"nozen.left(1)", b"nozen.move(10,0)",
+                                 b"nozen.move(10,0)", b"nozen.left(0)"])
         
     def test_double_click_sequence(self):
         """Test double-click sequence"""
-        sequence = [
-            "nozen.left(1)\n",
-            "nozen.left(0)\n",
-            "nozen.left(1)\n",
-            "nozen.left(0)\n",
-        ]
+        click = (_LEFT_DOWN, _LEFT_UP)
         
-        self.assertEqual(len(sequence), 4)
+        self.assertEqual(parse_writes(click * 2),
+                         [_LEFT_DOWN[:-1], _LEFT_UP[:-1]] * 2)
         
     def test_type_sequence(self):
         """Test typing sequence with modifiers"""
@@ -224,6 +303,65 @@ class TestCommandSequences(unittest.TestCase):
         self.assertEqual(len(keys), 5)
 
 
+class TestWriteFraming(unittest.TestCase):
+    """Test that the injector's writes survive the firmware's line parser"""
+    
+    def setUp(self):
+        self.injector = CynthionInjector()
+        self.injector.ser = _FakePort()
+        self.injector._start_writer()
+        
+    def tearDown(self):
+        self.injector._q.put(None)
+        self.injector._writer.join()
+        
+    def test_batched_payload_loses_commands(self):
+        """Test that joined commands in one read only run the first"""
+        payload = move_cmd(10, -5) + _LEFT_DOWN + wheel_cmd(3)
+        
+        self.assertEqual(parse_writes([payload]), [b"nozen.move(10,-5)"])
+        
+    def test_one_command_per_write(self):
+        """Test that every queued command goes out in its own write"""
+        self.injector.move(10, -5)
+        self.injector.left_press()
+        self.injector.wheel(3)
+        self.injector.flush()
+        
+        writes = self.injector.ser.writes
+        self.assertEqual(writes, [b"nozen.move(10,-5)\n", _LEFT_DOWN, b"nozen.wheel(3)\n"])
+        self.assertEqual(parse_writes(writes), [w[:-1] for w in writes])
+        
+    def test_recoil_burst_one_move_per_write(self):
+        """Test that zero-delay recoil steps are still written separately"""
+        self.injector.play_recoil((1, 2, 0, 3, 4, 0, 5, 6, 0), iterations=2)
+        self.injector.flush()
+        
+        lines = parse_writes(self.injector.ser.writes)
+        self.assertEqual(lines, [b"nozen.move(1,2)", b"nozen.move(3,4)", b"nozen.move(5,6)"] * 2)
+
+
+class TestWriterErrors(unittest.TestCase):
+    """Test that a failing port surfaces on the calling thread"""
+    
+    def test_write_error_is_reraised(self):
+        """Test that a write failure is raised from flush() and later sends"""
+        injector = CynthionInjector()
+        injector.ser = _FailingPort()
+        injector._start_writer()
+        try:
+            injector.move(1, 1)
+            with self.assertRaises(OSError):
+                injector.flush()
+            with self.assertRaises(OSError):
+                injector.move(1, 1)
+            with self.assertRaises(OSError):
+                injector.play_recoil((1, 2, 0))
+        finally:
+            injector._q.put(None)
+            injector._writer.join()
+
+
 class TestCommandValidation(unittest.TestCase):
     """Test command validation logic"""
     
@@ -233,11 +371,8 @@ class TestCommandValidation(unittest.TestCase):
         MIN_REL = -127
         MAX_REL = 127
         
-        valid_coords = [0, 50, -50, MIN_REL, MAX_REL]
-        
-        for coord in valid_coords:
-            self.assertGreaterEqual(coord, MIN_REL)
-            self.assertLessEqual(coord, MAX_REL)
+        self.assertGreaterEqual(min(_VALID_REL_COORDS), MIN_REL)
+        self.assertLessEqual(max(_VALID_REL_COORDS), MAX_REL)
             
     def test_absolute_coordinate_range(self):
         """Test absolute positioning range"""
@@ -245,18 +380,17 @@ class TestCommandValidation(unittest.TestCase):
         MIN_ABS = -32768
         MAX_ABS = 32767
         
-        valid_coords = [0, 1000, -1000, MIN_ABS, MAX_ABS]
-        
-        for coord in valid_coords:
-            self.assertGreaterEqual(coord, MIN_ABS)
-            self.assertLessEqual(coord, MAX_ABS)
+        # array('h') range-checks every element in C
+        self.assertEqual(len(array('h', _VALID_ABS_COORDS)), len(_VALID_ABS_COORDS))
+        self.assertEqual(min(_VALID_ABS_COORDS), MIN_ABS)
+        with self.assertRaises(OverflowError):
+            array('h', [MAX_ABS + 1])
             
     def test_button_state_values(self):
         """Test button state values are binary"""
-        valid_states = [0, 1]
-        
-        for state in valid_states:
-            self.assertIn(state, [0, 1])
+        for state in (0, 1):
+            self.assertIn(state, _VALID_BUTTON_STATES)
+        self.assertNotIn(2, _VALID_BUTTON_STATES)
             
     def test_wheel_amount_range(self):
         """Test wheel scroll amount range"""
@@ -264,11 +398,8 @@ class TestCommandValidation(unittest.TestCase):
         MIN_WHEEL = -127
         MAX_WHEEL = 127
         
-        valid_amounts = [0, 1, -1, 5, -5, MIN_WHEEL, MAX_WHEEL]
-        
-        for amount in valid_amounts:
-            self.assertGreaterEqual(amount, MIN_WHEEL)
-            self.assertLessEqual(amount, MAX_WHEEL)
+        self.assertGreaterEqual(min(_VALID_WHEEL_AMOUNTS), MIN_WHEEL)
+        self.assertLessEqual(max(_VALID_WHEEL_AMOUNTS), MAX_WHEEL)
 
 
 class TestPatternValidation(unittest.TestCase):
@@ -276,69 +407,83 @@ class TestPatternValidation(unittest.TestCase):
     
     def test_pattern_triplet_validation(self):
         """Test that patterns must be triplets"""
-        valid_pattern = [10, -5, 100, 20, -10, 150]
-        invalid_pattern = [10, -5, 100, 20]  # Not divisible by 3
-        
-        self.assertEqual(len(valid_pattern) % 3, 0)
-        self.assertNotEqual(len(invalid_pattern) % 3, 0)
+        self.assertEqual(pack_pattern(_VALID_PATTERN),
+                         struct.pack('<6h', *_VALID_PATTERN))
+        with self.assertRaises(ValueError):
+            pack_pattern(_INVALID_PATTERN)
+        with self.assertRaises(struct.error):
+            pack_pattern((0, 0, 32768))
+        
+    def test_render_recoil_bursts(self):
+        """Test that moves are grouped until a step with a delay"""
+        bursts = CynthionInjector()._render_recoil((1, 2, 0, 3, 4, 50, 5, 6, 0))
+        
+        self.assertEqual(bursts, [
+            ((b"nozen.move(1,2)\n", b"nozen.move(3,4)\n"), 0.05),
+            ((b"nozen.move(5,6)\n",), 0.0),
+        ])
         
     def test_pattern_value_range(self):
         """Test pattern values are in valid range"""
-        pattern = [10, -5, 100, 20, -10, 150]
-        
-        # x,y values should be in i16 range, delays should be positive
-        for i, val in enumerate(pattern):
-            if i % 3 == 2:  # delay values (every 3rd)
-                self.assertGreater(val, 0, "Delay should be positive")
-            else:  # x,y values
-                self.assertGreaterEqual(val, -32768)
-                self.assertLessEqual(val, 32767)
+        # Every value is an i16 on the wire, delays should be positive
+        array('h', _VALID_PATTERN)
+        self.assertGreater(min(_VALID_PATTERN[2::3]), 0, "Delay should be positive")
                 
     def test_pattern_name_validation(self):
         """Test pattern name requirements"""
-        valid_names = ["ak47", "m4a1", "test_pattern", "recoil123"]
-        
-        for name in valid_names:
-            self.assertIsInstance(name, str)
-            self.assertGreater(len(name), 0)
-            self.assertLessEqual(len(name), 32)  # MAX_PATTERN_NAME_LEN
+        for name in ("ak47", "m4a1", "test_pattern", "recoil123", "x" * 32):
+            with self.subTest(name=name):
+                self.assertIsNotNone(is_valid_pattern_name(name))
+        
+        # Empty, too long, or containing protocol delimiters
+        for name in ("", "x" * 33, "ak)47", "ak47\n", "a,b"):
+            with self.subTest(name=name):
+                self.assertIsNone(is_valid_pattern_name(name))
+        
+    def test_pattern_name_injection_rejected(self):
+        """Test that a name can't smuggle a second command onto the wire"""
+        with self.assertRaises(ValueError):
+            recoil_add_cmd("a)b\nnozen.restart", [1, 2, 3])
+        
+        injector = CynthionInjector()
+        injector.ser = _FakePort()
+        injector._start_writer()
+        try:
+            for method in (injector.recoil_delete, injector.recoil_get):
+                with self.subTest(method=method.__name__):
+                    with self.assertRaises(ValueError):
+                        method("ak47)\nnozen.restart")
+        finally:
+            injector._q.put(None)
+            injector._writer.join()
+        self.assertEqual(injector.ser.writes, [])
             
     def test_max_pattern_steps(self):
         """Test maximum pattern size"""
         MAX_STEPS = 64
         
-        # Create a pattern at the limit (64 values = 21 triplets + 1 extra)
-        # Actually 63 values = 21 triplets is max
-        max_pattern = [1, 2, 3] * 21
-        
-        self.assertLessEqual(len(max_pattern), MAX_STEPS)
-        self.assertEqual(len(max_pattern) % 3, 0)
+        self.assertLessEqual(len(_MAX_PATTERN), MAX_STEPS)
+        self.assertEqual(len(_MAX_PATTERN) % 3, 0)
 
 
 class TestUtilityCommands(unittest.TestCase):
     """Test utility and debug commands"""
     
-    def test_getpos_command(self):
-        """Test get position command"""
-        cmd = "nozen.getpos\n"
-        self.assertEqual(cmd, "nozen.getpos\n")
-        
-    def test_restart_command(self):
-        """Test restart command"""
-        cmd = "nozen.restart\n"
-        self.assertEqual(cmd, "nozen.restart\n")
-        
-    def test_descriptor_stats_command(self):
-        """Test descriptor statistics command"""
-        cmd = "nozen.descriptor.stats\n"
-        self.assertEqual(cmd, "nozen.descriptor.stats\n")
+    def test_literal_commands(self):
+        """Test commands that take no arguments"""
+        for name, cmd, expected in _LITERAL_CMDS:
+            with self.subTest(name=name):
+                self.assertEqual(cmd, expected)
+                self.assertTrue(cmd.startswith(b"nozen."))
+                self.assertEqual(cmd.count(b"\n"), 1)
+                self.assertTrue(cmd.endswith(b"\n"))
         
     def test_descriptor_get_command(self):
         """Test descriptor get command"""
         addr, iface = 1, 0
-        cmd = f"nozen.descriptor.get({addr},{iface})\n"
+        cmd = b"nozen.descriptor.get(%d,%d)\n" % (addr, iface)
         
-        self.assertEqual(cmd, "nozen.descriptor.get(1,0)\n")
+        self.assertEqual(cmd, b"nozen.descriptor.get(1,0)\n")
 
 
 class TestResponseParsing(unittest.TestCase):
@@ -346,21 +491,19 @@ class TestResponseParsing(unittest.TestCase):
     
     def test_position_response_format(self):
         """Test parsing position response"""
-        response = "km.pos(100,200)\n"
+        response = b"km.pos(100,200)\n"
         
-        # Parse the response
-        self.assertTrue(response.startswith("km.pos("))
-        self.assertTrue(response.endswith(")\n"))
+        self.assertEqual(parse_pos(response), (100, 200))
         
-        # Extract coordinates
-        coords_str = response[7:-2]  # Remove "km.pos(" and ")\n"
-        x_str, y_str = coords_str.split(',')
+    def test_position_response_negative(self):
+        """Test parsing position response with negative coordinates"""
+        self.assertEqual(parse_pos(b"km.pos(-32768,-5)\n"), (-32768, -5))
         
-        x = int(x_str)
-        y = int(y_str)
-        
-        self.assertEqual(x, 100)
-        self.assertEqual(y, 200)
+    def test_position_response_rejects_other_lines(self):
+        """Test that non-position replies don't match"""
+        for line in (b"OK\n", b"km.pos(1)\n", b"km.pos(a,b)\n"):
+            with self.subTest(line=line):
+                self.assertIsNone(parse_pos(line))
         
     def test_success_response(self):
         """Test parsing success responses"""
@@ -385,19 +528,12 @@ class TestResponseParsing(unittest.TestCase):
 def run_tests():
     """Run all unit tests"""
     loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-    
-    # Add all test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestMouseCommands))
-    suite.addTests(loader.loadTestsFromTestCase(TestKeyboardCommands))
-    suite.addTests(loader.loadTestsFromTestCase(TestRecoilCommands))
-    suite.addTests(loader.loadTestsFromTestCase(TestCommandSequences))
-    suite.addTests(loader.loadTestsFromTestCase(TestCommandValidation))
-    suite.addTests(loader.loadTestsFromTestCase(TestPatternValidation))
-    suite.addTests(loader.loadTestsFromTestCase(TestUtilityCommands))
-    suite.addTests(loader.loadTestsFromTestCase(TestResponseParsing))
+    loader.sortTestMethodsUsing = None  # keep declaration order, skip the sort
+    suite = loader.loadTestsFromModule(sys.modules[__name__])
     
-    runner = unittest.TextTestRunner(verbosity=2)
+    # Quiet by default; TEST_VERBOSITY=2 restores the per-test listing
+    runner = unittest.TextTestRunner(
+        verbosity=int(os.environ.get("TEST_VERBOSITY", "0")), buffer=True)
     result = runner.run(suite)
     
     return 0 if result.wasSuccessful() else 1